@@ -0,0 +1,212 @@
+"""
+Compare LLM models on recorded traffic.
+
+Replays the prompts recorded with ``DYELOG_LLM_TRAFFIC_FILE`` against
+one or more candidate models and compares them with the recorded
+replies. Calls of the same prompt are sent back to back to every
+candidate, so drift in Ollama's load affects all of them alike.
+Reports p50/p95 latency and errors per task and model, and agreement
+with the recorded replies: for ``score_words`` whether the best word is
+the same and the overlap of the top ``--top-k`` words, for
+``generate_sentences`` the overlap of the words used::
+
+    python -m benchmarks.compare_models traffic.jsonl --candidate llama3.2:1b
+    python -m benchmarks.compare_models traffic.jsonl --task score_words
+        --candidate '{"model": "llama3.2:1b-instruct-q4_K_M", "num_predict": 256}'
+
+A candidate is a model tag or a JSON object with the fields of
+``dyelog.settings.ModelConfig``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.matcher import percentile
+from dyelog.services.llm import load_traffic
+from dyelog.settings import ModelConfig, settings
+from dyelog.web.api.chat.views import parse_scores, parse_sentences
+
+WORD = re.compile(r"[a-z']+")
+
+
+def parse_candidate(value: str) -> ModelConfig:
+    """Parse a ``--candidate`` argument."""
+    if value.lstrip().startswith("{"):
+        return ModelConfig.model_validate_json(value)
+    return ModelConfig(model=value)
+
+
+def candidate_name(candidate: ModelConfig) -> str:
+    """Name of a candidate in the report: its tag and any options."""
+    options = candidate.options()
+    return f"{candidate.model} {json.dumps(options)}" if options else candidate.model
+
+
+def score_agreement(expected: str, actual: str, top_k: int) -> Dict[str, float]:
+    """Agreement of two scoring replies."""
+    expected_words = [word for word, _ in parse_scores(expected)[:top_k]]
+    actual_words = [word for word, _ in parse_scores(actual)[:top_k]]
+    if not expected_words:
+        return {}
+    return {
+        "top1": float(bool(actual_words) and actual_words[0] == expected_words[0]),
+        "overlap": len(set(expected_words) & set(actual_words)) / len(expected_words),
+    }
+
+
+def sentence_agreement(expected: str, actual: str) -> Dict[str, float]:
+    """Agreement of two sentence replies as the Jaccard index of their words."""
+    expected_words = set(WORD.findall(" ".join(parse_sentences(expected)).lower()))
+    actual_words = set(WORD.findall(" ".join(parse_sentences(actual)).lower()))
+    if not expected_words | actual_words:
+        return {}
+    union = expected_words | actual_words
+    return {"overlap": len(expected_words & actual_words) / len(union)}
+
+
+@dataclass
+class ModelStats:
+    """Replies of one model to the prompts of one task."""
+
+    latencies_ms: List[float] = field(default_factory=list)
+    errors: int = 0
+    agreement: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+
+    def report(self) -> Dict[str, Any]:
+        """Summarize the replies."""
+        result: Dict[str, Any] = {
+            "calls": len(self.latencies_ms),
+            "errors": self.errors,
+        }
+        if self.latencies_ms:
+            result["p50_ms"] = percentile(self.latencies_ms, 50)
+            result["p95_ms"] = percentile(self.latencies_ms, 95)
+        for name, values in sorted(self.agreement.items()):
+            result[f"{name}_agreement"] = sum(values) / len(values)
+        return result
+
+
+async def replay(
+    client: Any,
+    entry: Dict[str, Any],
+    candidate: ModelConfig,
+    stats: ModelStats,
+    top_k: int,
+) -> None:
+    """Send one recorded prompt to a candidate and compare the reply."""
+    start = time.perf_counter()
+    try:
+        response = await client.chat(
+            model=candidate.model,
+            messages=[{"role": "user", "content": entry["prompt"]}],
+            stream=False,
+            options=candidate.options() or None,
+        )
+    except Exception:
+        stats.errors += 1
+        return
+    stats.latencies_ms.append((time.perf_counter() - start) * 1000)
+    content = response["message"]["content"]
+    if entry["task"] == "score_words":
+        agreement = score_agreement(entry["content"], content, top_k)
+    else:
+        agreement = sentence_agreement(entry["content"], content)
+    for name, value in agreement.items():
+        stats.agreement[name].append(value)
+
+
+async def compare(
+    entries: List[Dict[str, Any]],
+    candidates: List[ModelConfig],
+    host: str,
+    top_k: int,
+    concurrency: int,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Replay recorded calls against every candidate.
+
+    :return: per task, the recorded replies and every candidate's results.
+    """
+    from ollama import AsyncClient
+
+    client = AsyncClient(host=host)
+    results: Dict[str, Dict[str, ModelStats]] = defaultdict(
+        lambda: defaultdict(ModelStats),
+    )
+    for entry in entries:
+        recorded = results[entry["task"]][f"recorded:{entry['model']['model']}"]
+        recorded.latencies_ms.append(entry["latency_ms"])
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def replay_entry(entry: Dict[str, Any]) -> None:
+        async with semaphore:
+            for candidate in candidates:
+                stats = results[entry["task"]][candidate_name(candidate)]
+                await replay(client, entry, candidate, stats, top_k)
+
+    await asyncio.gather(*(replay_entry(entry) for entry in entries))
+    return {
+        task: {name: stats.report() for name, stats in models.items()}
+        for task, models in results.items()
+    }
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("traffic", type=Path, help="recorded LLM calls")
+    parser.add_argument(
+        "--candidate",
+        type=parse_candidate,
+        action="append",
+        required=True,
+        help="model tag or ModelConfig JSON; can be repeated",
+    )
+    parser.add_argument("--host", default=settings.ollama_host)
+    parser.add_argument(
+        "--task",
+        action="append",
+        help="only replay calls of this task; can be repeated",
+    )
+    parser.add_argument("--limit", type=int, help="replay at most this many calls")
+    parser.add_argument("--top-k", type=int, default=settings.predict_top_k)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="prompts replayed at once; more than 1 adds queueing to latencies",
+    )
+    parser.add_argument("--output", type=Path, help="Write results to this file.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entrypoint of the model comparison."""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    entries = [
+        entry
+        for entry in load_traffic(args.traffic)
+        if args.task is None or entry["task"] in args.task
+    ][: args.limit]
+    results = asyncio.run(
+        compare(entries, args.candidate, args.host, args.top_k, args.concurrency),
+    )
+    rendered = json.dumps(results, indent=2, sort_keys=True)
+    print(rendered)
+    if args.output is not None:
+        args.output.write_text(rendered + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Stand-in for the Ollama HTTP API.
+
+Answers ``POST /api/chat`` like a model that follows dyelog's prompts:
+word scoring prompts get a ``WORD:SCORE`` line per word and sentence
+prompts get a few sentences. Latency is ``latency`` seconds plus the
+response tokens divided by ``token_rate``, at most ``parallel`` requests
+are processed at once (like ``OLLAMA_NUM_PARALLEL``) and a fraction
+``failure_rate`` of requests fails with a 500::
+
+    python -m benchmarks.fake_ollama --port 11435 --latency 0.2 --token-rate 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import re
+import socket
+import threading
+import time
+import zlib
+from typing import Any, Dict, List
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+
+WORDS_LINE = re.compile(r"relevant each of these words is for the context:\n(.*)\n")
+SENTENCE_WORD = re.compile(r'Use the word "([^"]*)"')
+
+
+def fake_reply(prompt: str) -> str:
+    """
+    Deterministic answer to a dyelog prompt.
+
+    :param prompt: user message.
+    :return: reply content.
+    """
+    words_line = WORDS_LINE.search(prompt)
+    if words_line is not None:
+        words = [word.strip() for word in words_line.group(1).split(",")]
+        # Stable pseudo-random scores, so runs are comparable.
+        return "\n".join(
+            f"{word}:{zlib.crc32(word.encode()) % 1000 / 10}" for word in words if word
+        )
+    sentence_word = SENTENCE_WORD.search(prompt)
+    word = sentence_word.group(1).lower() if sentence_word else "that"
+    return "\n".join(
+        [
+            f"I would like {word}.",
+            f"Can we talk about {word}?",
+            f"{word.capitalize()}.",
+        ],
+    )
+
+
+def create_app(
+    latency: float = 0.0,
+    token_rate: float = 0.0,
+    failure_rate: float = 0.0,
+    parallel: int = 1,
+    seed: int = 0,
+) -> FastAPI:
+    """
+    Build the fake Ollama application.
+
+    :param latency: fixed seconds per request.
+    :param token_rate: response tokens generated per second; 0 for instant.
+    :param failure_rate: fraction of requests answered with a 500.
+    :param parallel: requests processed concurrently; the rest queue.
+    :param seed: seed of the failure injection.
+    :return: application.
+    """
+    app = FastAPI()
+    rng = random.Random(seed)  # noqa: S311
+    semaphore = asyncio.Semaphore(parallel)
+    stats: Dict[str, int] = {"requests": 0, "failures": 0}
+    app.state.stats = stats
+
+    @app.post("/api/chat")
+    async def chat(request: Request) -> Dict[str, Any]:
+        body = await request.json()
+        messages: List[Dict[str, str]] = body.get("messages") or [{}]
+        prompt = messages[-1].get("content", "")
+        reply = fake_reply(prompt)
+        prompt_tokens = len(prompt) // 4
+        reply_tokens = max(1, len(reply) // 4)
+        stats["requests"] += 1
+        async with semaphore:
+            delay = latency + (reply_tokens / token_rate if token_rate else 0.0)
+            await asyncio.sleep(delay)
+            if rng.random() < failure_rate:
+                stats["failures"] += 1
+                raise HTTPException(status_code=500, detail="injected failure")
+        return {
+            "model": body.get("model"),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "message": {"role": "assistant", "content": reply},
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int(delay * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": reply_tokens,
+        }
+
+    @app.get("/api/tags")
+    async def tags() -> Dict[str, Any]:
+        return {"models": []}
+
+    return app
+
+
+def free_port() -> int:
+    """Find a free local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+class BackgroundServer:
+    """Runs an ASGI app with uvicorn on a background thread."""
+
+    def __init__(self, app: FastAPI, port: int | None = None) -> None:
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        config = uvicorn.Config(app, port=self.port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> BackgroundServer:  # noqa: PYI034
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+
+def main(argv: List[str] | None = None) -> None:
+    """Serve the fake Ollama API in the foreground."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--token-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--parallel", type=int, default=1)
+    args = parser.parse_args(argv)
+    app = create_app(args.latency, args.token_rate, args.failure_rate, args.parallel)
+    uvicorn.run(app, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+End-to-end load test of the prediction API.
+
+Starts the fake Ollama server (see ``benchmarks.fake_ollama``) and the
+app with the local speech backend, then keeps ``--concurrency`` clients
+sending requests for ``--duration`` seconds. Prefixes of common words
+are turned into letter ranges with ``find_pattern``, so the patterns look
+like real typing. Reports throughput, p50/p95/p99 latency and error and
+degraded rates per endpoint as JSON::
+
+    python -m benchmarks.load --concurrency 16 --ollama-latency 0.3
+    python -m benchmarks.load --app-url http://127.0.0.1:8000 --duration 60
+
+With ``--app-url`` an already running app is used; it has to be
+configured against the fake Ollama server itself.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+from benchmarks.fake_ollama import BackgroundServer, create_app, free_port
+from benchmarks.matcher import percentile
+from dyelog.utils import find_pattern
+
+DATA_DIR = Path(__file__).parent.parent / "data"
+
+
+@dataclass
+class EndpointStats:
+    """Outcomes of the requests sent to one endpoint."""
+
+    latencies_ms: List[float] = field(default_factory=list)
+    errors: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    degraded: int = 0
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        """Summarize the recorded requests."""
+        count = len(self.latencies_ms)
+        if not count:
+            return {"requests": 0}
+        failed = sum(self.errors.values())
+        return {
+            "requests": count,
+            "throughput_rps": count / elapsed,
+            "p50_ms": percentile(self.latencies_ms, 50),
+            "p95_ms": percentile(self.latencies_ms, 95),
+            "p99_ms": percentile(self.latencies_ms, 99),
+            "error_rate": failed / count,
+            "errors": dict(self.errors),
+            "degraded_rate": self.degraded / count,
+        }
+
+
+def load_inputs() -> tuple[List[str], List[str]]:
+    """Common words and caregiver questions to build requests from."""
+    words = [
+        word.upper()
+        for word in (DATA_DIR / "words.txt").read_text().split()
+        if word.isalpha() and word.isascii()
+    ]
+    contexts = [
+        line.strip()
+        for line in (DATA_DIR / "contexts.txt").read_text().splitlines()
+        if line.strip()
+    ]
+    return words, contexts
+
+
+def choose_request(
+    rng: random.Random,
+    words: List[str],
+    contexts: List[str],
+    args: argparse.Namespace,
+) -> tuple[str, str, Dict[str, Any]]:
+    """Pick the endpoint, path and body of the next request."""
+    if rng.random() < args.speech_ratio:
+        text = f"I would like {rng.choice(words).lower()}."
+        return "synthesize", "/api/synthesize-speech", {"text": text}
+    word = rng.choice(words)
+    body: Dict[str, Any] = {
+        "letter_ranges": find_pattern(word[: rng.randint(1, len(word))]),
+        "context": rng.choice(contexts),
+    }
+    if args.budget is not None:
+        body["budget_seconds"] = args.budget
+    return "predict", "/api/predict", body
+
+
+async def drive(args: argparse.Namespace, app_url: str) -> Dict[str, Any]:
+    """Keep ``args.concurrency`` requests in flight for ``args.duration`` seconds."""
+    words, contexts = load_inputs()
+    stats: Dict[str, EndpointStats] = defaultdict(EndpointStats)
+    stop_at = time.perf_counter() + args.duration
+
+    async def client_loop(client: httpx.AsyncClient, seed: int) -> None:
+        rng = random.Random(seed)  # noqa: S311
+        while time.perf_counter() < stop_at:
+            endpoint, path, body = choose_request(rng, words, contexts, args)
+            endpoint_stats = stats[endpoint]
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+            except httpx.HTTPError as e:
+                endpoint_stats.errors[type(e).__name__] += 1
+                continue
+            finally:
+                endpoint_stats.latencies_ms.append((time.perf_counter() - start) * 1e3)
+            if response.status_code >= 400:
+                endpoint_stats.errors[str(response.status_code)] += 1
+            elif endpoint == "predict" and response.json().get("degraded"):
+                endpoint_stats.degraded += 1
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    started = time.perf_counter()
+    async with httpx.AsyncClient(
+        base_url=app_url,
+        timeout=args.timeout,
+        limits=limits,
+    ) as client:
+        await asyncio.gather(
+            *(client_loop(client, args.seed + i) for i in range(args.concurrency)),
+        )
+    elapsed = time.perf_counter() - started
+    return {name: endpoint.report(elapsed) for name, endpoint in stats.items()}
+
+
+def start_app(
+    args: argparse.Namespace,
+    ollama_url: str,
+) -> tuple[subprocess.Popen, str]:
+    """Start the app in a subprocess and wait until it has started up."""
+    port = free_port()
+    env = {
+        **os.environ,
+        "DYELOG_PORT": str(port),
+        "DYELOG_WORKERS_COUNT": str(args.workers),
+        "DYELOG_OLLAMA_HOST": ollama_url,
+        "DYELOG_SPEECH_BACKEND": "local",
+        "DYELOG_SPEECH_LOCAL_LATENCY_SECONDS": str(args.speech_latency),
+        "DYELOG_LOG_LEVEL": "WARNING",
+    }
+    process = subprocess.Popen([sys.executable, "-m", "dyelog"], env=env)  # noqa: S603
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{url}/api/health").json()["status"] != "starting":
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("App didn't start in time")
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the load test against a fake Ollama server."""
+    fake = create_app(
+        latency=args.ollama_latency,
+        token_rate=args.ollama_token_rate,
+        failure_rate=args.ollama_failure_rate,
+        parallel=args.ollama_parallel,
+        seed=args.seed,
+    )
+    with BackgroundServer(fake) as ollama:
+        process = None
+        app_url = args.app_url
+        if app_url is None:
+            process, app_url = start_app(args, ollama.url)
+        try:
+            results = asyncio.run(drive(args, app_url))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+        ollama_stats = dict(fake.state.stats)
+    return {
+        "meta": {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "workers": args.workers,
+            "ollama_latency": args.ollama_latency,
+            "ollama_token_rate": args.ollama_token_rate,
+            "ollama_failure_rate": args.ollama_failure_rate,
+            "ollama_parallel": args.ollama_parallel,
+            "speech_latency": args.speech_latency,
+            "speech_ratio": args.speech_ratio,
+            "budget": args.budget,
+            "seed": args.seed,
+        },
+        "endpoints": results,
+        "ollama": ollama_stats,
+    }
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--app-url", help="Use a running app instead of starting one.")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--ollama-latency", type=float, default=0.2)
+    parser.add_argument(
+        "--ollama-token-rate",
+        type=float,
+        default=0.0,
+        help="Response tokens per second; 0 makes generation instant.",
+    )
+    parser.add_argument("--ollama-failure-rate", type=float, default=0.0)
+    parser.add_argument("--ollama-parallel", type=int, default=1)
+    parser.add_argument("--speech-latency", type=float, default=0.05)
+    parser.add_argument(
+        "--speech-ratio",
+        type=float,
+        default=0.0,
+        help="Fraction of requests sent to /api/synthesize-speech.",
+    )
+    parser.add_argument("--budget", type=float, help="budget_seconds of predictions.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Write results to this file.")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] | None = None) -> int:
+    """Entrypoint of the load test."""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    results = run(args)
+    rendered = json.dumps(results, indent=2, sort_keys=True)
+    print(rendered)
+    if args.output is not None:
+        args.output.write_text(rendered + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""
+Micro-benchmarks for PatternMatcher and find_pattern.
+
+Measures index build time and memory, ``find_matches`` latency for
+every group pattern of length 1..8, the latency of appending a range
+with ``IncrementalMatcher`` and ``find_pattern`` throughput on the real
+word list. Results are written as JSON and can be compared
+against a stored baseline::
+
+    python -m benchmarks.matcher --output bench.json
+    python -m benchmarks.matcher --save-baseline benchmarks/baseline.json
+    python -m benchmarks.matcher --baseline benchmarks/baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import platform
+import random
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+from dyelog.utils import IncrementalMatcher, MatchDelta, PatternMatcher, find_pattern
+
+GROUPS = ("A-F", "G-M", "N-T", "U-Z")
+DEFAULT_WORDS_FILE = Path(__file__).parent.parent / "data" / "words_alpha.txt"
+# Metrics where a bigger value is a regression; everything else is a throughput.
+LOWER_IS_BETTER = ("build_seconds", "peak_rss_mb", "p50_ms", "p99_ms")
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in megabytes."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    if sys.platform == "darwin":
+        return rss / (1024 * 1024)
+    return rss / 1024
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def patterns(length: int, max_patterns: int, seed: int) -> Iterator[str]:
+    """
+    Group patterns of the given length.
+
+    All 4^length patterns are produced unless ``max_patterns`` is smaller,
+    in which case a seeded random sample is used so runs stay comparable.
+    """
+    total = len(GROUPS) ** length
+    if not max_patterns or total <= max_patterns:
+        for combo in itertools.product(GROUPS, repeat=length):
+            yield " ".join(combo)
+        return
+    rng = random.Random(seed + length)  # noqa: S311
+    for sampled in sorted(rng.sample(range(total), max_patterns)):
+        groups = []
+        for _ in range(length):
+            sampled, group = divmod(sampled, len(GROUPS))  # noqa: PLW2901
+            groups.append(GROUPS[group])
+        yield " ".join(groups)
+
+
+def bench_index(words_file: Path) -> Dict[str, Any]:
+    """Time building the word index and record the resulting memory."""
+    start = time.perf_counter()
+    matcher = PatternMatcher(file=words_file)
+    build_seconds = time.perf_counter() - start
+    return {
+        "matcher": matcher,
+        "build_seconds": build_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        "words": sum(len(words) for words in matcher.words_by_length.values()),
+    }
+
+
+def bench_find_matches(
+    matcher: PatternMatcher,
+    max_length: int,
+    max_patterns: int,
+    seed: int,
+) -> Dict[str, Any]:
+    """Latency of find_matches per pattern length and over all patterns."""
+    by_length = {}
+    all_timings: List[float] = []
+    for length in range(1, max_length + 1):
+        timings = []
+        matches = 0
+        for pattern in patterns(length, max_patterns, seed):
+            start = time.perf_counter()
+            matches += len(matcher.find_matches(pattern))
+            timings.append((time.perf_counter() - start) * 1000)
+        all_timings.extend(timings)
+        by_length[str(length)] = {
+            "patterns": len(timings),
+            "p50_ms": percentile(timings, 50),
+            "p99_ms": percentile(timings, 99),
+            "mean_matches": matches / len(timings),
+        }
+    return {
+        "by_length": by_length,
+        "overall": {
+            "patterns": len(all_timings),
+            "p50_ms": percentile(all_timings, 50),
+            "p99_ms": percentile(all_timings, 99),
+        },
+    }
+
+
+def bench_incremental(
+    matcher: PatternMatcher,
+    max_length: int,
+    max_patterns: int,
+    seed: int,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Latency of appending one range to a previous query.
+
+    The parent pattern is queried first so its state is cached, which is
+    what a typing user sees.
+    """
+    incremental = IncrementalMatcher(matcher, max_words=sys.maxsize)
+    results = {}
+    for length in range(1, max_length + 1):
+        timings = []
+        for pattern in patterns(length, max_patterns, seed):
+            *parent, last = pattern.split()
+            handle = incremental.query(parent).handle
+            start = time.perf_counter()
+            incremental.apply(handle, MatchDelta("append", last))
+            timings.append((time.perf_counter() - start) * 1000)
+        results[str(length)] = {
+            "patterns": len(timings),
+            "p50_ms": percentile(timings, 50),
+            "p99_ms": percentile(timings, 99),
+        }
+    return results
+
+
+def bench_find_pattern(matcher: PatternMatcher) -> Dict[str, float]:
+    """Throughput of find_pattern over the whole dictionary."""
+    words = [
+        word
+        for bucket in matcher.words_by_length.values()
+        for word in bucket
+        if word.isalpha() and word.isascii()
+    ]
+    start = time.perf_counter()
+    for word in words:
+        find_pattern(word)
+    elapsed = time.perf_counter() - start
+    return {"words": len(words), "words_per_second": len(words) / elapsed}
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run every benchmark and collect the results."""
+    index = bench_index(args.words_file)
+    matcher = index.pop("matcher")
+    find_matches = bench_find_matches(
+        matcher,
+        args.max_length,
+        args.max_patterns,
+        args.seed,
+    )
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "words_file": str(args.words_file),
+            "max_patterns": args.max_patterns,
+            "seed": args.seed,
+        },
+        "index": index,
+        "find_matches": find_matches,
+        "incremental": bench_incremental(
+            matcher,
+            args.max_length,
+            args.max_patterns,
+            args.seed,
+        ),
+        "find_pattern": bench_find_pattern(matcher),
+    }
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Flatten nested results into ``a.b.c`` keys, skipping metadata."""
+    flat: Dict[str, float] = {}
+    for key, value in results.items():
+        if key == "meta":
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = float(value)
+    return flat
+
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float,
+) -> List[str]:
+    """
+    Find metrics that got worse than the baseline by more than ``tolerance``.
+
+    :return: human-readable description of every regression.
+    """
+    regressions = []
+    current_flat = flatten(current)
+    for name, old in flatten(baseline).items():
+        new = current_flat.get(name)
+        if new is None or not old:
+            continue
+        metric = name.rsplit(".", 1)[-1]
+        if metric in LOWER_IS_BETTER:
+            change = (new - old) / old
+        elif metric.endswith("per_second"):
+            change = (old - new) / old
+        else:
+            continue
+        if change > tolerance:
+            regressions.append(f"{name}: {old:.4g} -> {new:.4g} ({change:+.0%} worse)")
+    return regressions
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--words-file", type=Path, default=DEFAULT_WORDS_FILE)
+    parser.add_argument("--max-length", type=int, default=8)
+    parser.add_argument(
+        "--max-patterns",
+        type=int,
+        default=256,
+        help="Patterns sampled per length when 4^n is larger; 0 runs all of them.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Write results to this file.")
+    parser.add_argument("--baseline", type=Path, help="Compare against this file.")
+    parser.add_argument("--save-baseline", type=Path, help="Store results as baseline.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative slowdown before a metric counts as a regression.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] | None = None) -> int:
+    """Entrypoint of the benchmark."""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    results = run(args)
+    rendered = json.dumps(results, indent=2, sort_keys=True)
+    print(rendered)
+    for path in (args.output, args.save_baseline):
+        if path is not None:
+            path.write_text(rendered + "\n")
+    if args.baseline is None:
+        return 0
+    regressions = compare(
+        results,
+        json.loads(args.baseline.read_text()),
+        args.tolerance,
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
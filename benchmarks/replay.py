@@ -0,0 +1,266 @@
+"""
+Keystroke replay of target utterances.
+
+Every word of a corpus of ``context<TAB>utterance`` lines is turned
+into its letter ranges with ``find_pattern`` and typed one range at a
+time through ``/api/predict``, the way a patient would. The word is
+selected as soon as it's among the ``--visible`` prompt options shown,
+which costs one more keystroke. Reports, per pass over the corpus:
+
+- keystrokes saved compared to typing every range and then selecting
+  the word, and the words that were never shown;
+- the rank of the target word after each keystroke;
+- end-to-end latency per keystroke and per word.
+
+By default the app runs against the fake Ollama server; ``--ollama-url``
+uses a real one and ``--app-url`` an already running app::
+
+    python -m benchmarks.replay --passes 2 --output replay.json
+    python -m benchmarks.replay --ollama-url http://127.0.0.1:11434
+
+Running several passes shows the effect of warm caches.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.fake_ollama import BackgroundServer, create_app
+from benchmarks.load import start_app
+from benchmarks.matcher import percentile
+from dyelog.utils import find_pattern
+
+DEFAULT_CORPUS = Path(__file__).parent.parent / "data" / "utterances.tsv"
+
+
+def load_corpus(path: Path) -> List[Tuple[str, List[str]]]:
+    """Contexts and the uppercase words of their target utterances."""
+    corpus = []
+    for line in path.read_text().splitlines():
+        if not line.strip():
+            continue
+        context, _, utterance = line.rpartition("\t")
+        words = [word.upper() for word in utterance.split()]
+        corpus.append((context, [word for word in words if word.isalpha()]))
+    return corpus
+
+
+@dataclass
+class Step:
+    """Outcome of one keystroke."""
+
+    keystrokes: int
+    latency_ms: float
+    rank: Optional[int]
+    degraded: bool
+
+
+@dataclass
+class WordReplay:
+    """Keystrokes typed for one target word."""
+
+    word: str
+    context: str
+    steps: List[Step] = field(default_factory=list)
+    selected_after: Optional[int] = None
+
+    @property
+    def baseline(self) -> int:
+        """Keystrokes without predictions: every range, then selecting the word."""
+        return len(self.word) + 1
+
+    @property
+    def used(self) -> int:
+        """Keystrokes typed, including the selection."""
+        if self.selected_after is None:
+            return self.baseline
+        return self.selected_after + 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Per-word details for the output file."""
+        return {
+            "word": self.word,
+            "context": self.context,
+            "keystrokes": self.used,
+            "selected_after": self.selected_after,
+            "ranks": [step.rank for step in self.steps],
+            "latencies_ms": [step.latency_ms for step in self.steps],
+        }
+
+
+def latency_report(latencies_ms: List[float]) -> Dict[str, float]:
+    """Percentiles of a non-empty list of latencies."""
+    return {
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+        "p99_ms": percentile(latencies_ms, 99),
+    }
+
+
+def report(replays: List[WordReplay], visible: int) -> Dict[str, Any]:
+    """Summarize one pass over the corpus."""
+    baseline = sum(replay.baseline for replay in replays)
+    used = sum(replay.used for replay in replays)
+    steps = [step for replay in replays for step in replay.steps]
+    by_keystroke: Dict[int, List[Step]] = defaultdict(list)
+    for step in steps:
+        by_keystroke[step.keystrokes].append(step)
+
+    ranks = {}
+    for keystrokes, group in sorted(by_keystroke.items()):
+        found = [step.rank for step in group if step.rank is not None]
+        ranks[keystrokes] = {
+            "words": len(group),
+            "found_rate": len(found) / len(group),
+            "visible_rate": sum(rank < visible for rank in found) / len(group),
+            "mean_rank": sum(found) / len(found) if found else None,
+            **latency_report([step.latency_ms for step in group]),
+        }
+    word_times = [sum(step.latency_ms for step in replay.steps) for replay in replays]
+    return {
+        "words": len(replays),
+        "keystrokes": {
+            "baseline": baseline,
+            "used": used,
+            "saved": baseline - used,
+            "saved_rate": (baseline - used) / baseline if baseline else 0.0,
+        },
+        "missed": [replay.word for replay in replays if replay.selected_after is None],
+        "degraded_rate": sum(step.degraded for step in steps) / len(steps),
+        "keystroke_latency": latency_report([step.latency_ms for step in steps]),
+        "word_latency": latency_report(word_times),
+        "by_keystroke": ranks,
+    }
+
+
+async def replay_word(
+    client: httpx.AsyncClient,
+    context: str,
+    word: str,
+    args: argparse.Namespace,
+) -> WordReplay:
+    """Type the letter ranges of a word until it's shown."""
+    replay = WordReplay(word, context)
+    for keystrokes in range(1, len(word) + 1):
+        body: Dict[str, Any] = {
+            "letter_ranges": find_pattern(word[:keystrokes]),
+            "context": context,
+            "top_k": args.rank_depth,
+        }
+        if args.budget is not None:
+            body["budget_seconds"] = args.budget
+        start = time.perf_counter()
+        response = await client.post("/api/predict", json=body)
+        latency_ms = (time.perf_counter() - start) * 1e3
+        response.raise_for_status()
+        result = response.json()
+        options = [option["prompt"] for option in result["prompt_options"]]
+        rank = options.index(word) if word in options else None
+        replay.steps.append(Step(keystrokes, latency_ms, rank, result["degraded"]))
+        if rank is not None and rank < args.visible:
+            replay.selected_after = keystrokes
+            break
+    return replay
+
+
+async def replay_corpus(args: argparse.Namespace, app_url: str) -> List[Any]:
+    """Replay the corpus ``args.passes`` times, one keystroke at a time."""
+    corpus = load_corpus(args.corpus)
+    passes = []
+    async with httpx.AsyncClient(base_url=app_url, timeout=args.timeout) as client:
+        for _ in range(args.passes):
+            replays = [
+                await replay_word(client, context, word, args)
+                for context, words in corpus
+                for word in words
+            ]
+            passes.append(replays)
+    return passes
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Start the app if needed and replay the corpus."""
+    with ExitStack() as stack:
+        app_url = args.app_url
+        if app_url is None:
+            ollama_url = args.ollama_url
+            if ollama_url is None:
+                fake = create_app(latency=args.ollama_latency, parallel=4)
+                ollama_url = stack.enter_context(BackgroundServer(fake)).url
+            process, app_url = start_app(args, ollama_url)
+            stack.callback(process.wait)
+            stack.callback(process.terminate)
+        passes = asyncio.run(replay_corpus(args, app_url))
+    results: Dict[str, Any] = {
+        "meta": {
+            "corpus": str(args.corpus),
+            "visible": args.visible,
+            "llm": "app" if args.app_url else args.ollama_url or "fake",
+            "budget": args.budget,
+        },
+        "passes": [report(replays, args.visible) for replays in passes],
+    }
+    if args.details:
+        results["details"] = [
+            [replay.as_dict() for replay in replays] for replays in passes
+        ]
+    return results
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--app-url", help="Use a running app instead of starting one.")
+    parser.add_argument(
+        "--ollama-url",
+        help="Use this Ollama server instead of a fake.",
+    )
+    parser.add_argument("--ollama-latency", type=float, default=0.05)
+    parser.add_argument("--passes", type=int, default=1)
+    parser.add_argument(
+        "--visible",
+        type=int,
+        default=4,
+        help="Prompt options shown to the patient.",
+    )
+    parser.add_argument(
+        "--rank-depth",
+        type=int,
+        default=100,
+        help="Ranks past this are reported as not found.",
+    )
+    parser.add_argument("--budget", type=float, help="budget_seconds of predictions.")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--speech-latency", type=float, default=0.0)
+    parser.add_argument("--details", action="store_true", help="Include every word.")
+    parser.add_argument("--output", type=Path, help="Write results to this file.")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] | None = None) -> int:
+    """Entrypoint of the keystroke replay."""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    results = run(args)
+    rendered = json.dumps(results, indent=2, sort_keys=True)
+    print(rendered)
+    if args.output is not None:
+        args.output.write_text(rendered + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
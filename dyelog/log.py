@@ -0,0 +1,176 @@
+"""
+Logging pipeline.
+
+Records are put on a bounded queue by the request path and formatted
+and written as JSON lines by a background thread. Extra structured
+fields are passed as ``extra={"fields": {...}}``; large lists and long
+strings in them are cut down before the record is queued, so logging
+cost doesn't grow with the size of the payload.
+"""
+
+import atexit
+import copy
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+import ujson
+
+from dyelog.settings import settings
+
+_listener: Optional[QueueListener] = None
+
+
+def truncate(value: Any, max_items: int, max_chars: int) -> Any:
+    """
+    Cut a field value down to a bounded size.
+
+    Only the kept part of a sequence is copied, so the cost is bounded by
+    ``max_items`` and not by the length of the value.
+
+    :param value: field value.
+    :param max_items: max items kept from lists, tuples and sets.
+    :param max_chars: max characters kept from strings.
+    :return: truncated value.
+    """
+    if isinstance(value, str):
+        if len(value) > max_chars:
+            return f"{value[:max_chars]}... ({len(value)} chars)"
+        return value
+    if isinstance(value, (list, tuple)):
+        if len(value) > max_items:
+            return {"items": list(value[:max_items]), "total": len(value)}
+        return list(value)
+    if isinstance(value, (set, frozenset)):
+        return truncate(sorted(value, key=str)[:max_items], max_items, max_chars)
+    return value
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        Render a record with its structured fields.
+
+        :param record: log record.
+        :return: JSON line.
+        """
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return ujson.dumps(entry, default=str)
+
+
+class BackgroundQueueHandler(QueueHandler):
+    """
+    Queue handler that never blocks the caller.
+
+    Records are truncated and sampled here; formatting happens on the
+    listener thread. Records that don't fit in the queue are dropped
+    and counted.
+    """
+
+    def __init__(
+        self,
+        log_queue: "queue.Queue[logging.LogRecord]",
+        max_items: int,
+        max_chars: int,
+        debug_sample_rate: float,
+    ) -> None:
+        super().__init__(log_queue)
+        self.max_items = max_items
+        self.max_chars = max_chars
+        self.debug_sample_rate = debug_sample_rate
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Make the record safe to hand over to the listener thread.
+
+        :param record: log record.
+        :return: record with a rendered message and truncated fields.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        fields = getattr(record, "fields", None)
+        if fields:
+            record.fields = {
+                key: truncate(value, self.max_items, self.max_chars)
+                for key, value in fields.items()
+            }
+        return record
+
+    def sampled_out(self, record: logging.LogRecord) -> bool:
+        """
+        Whether a DEBUG record should be skipped.
+
+        :param record: log record.
+        :return: True if the record is dropped by sampling.
+        """
+        if record.levelno >= logging.INFO:
+            return False
+        return random.random() >= self.debug_sample_rate  # noqa: S311
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """
+        Queue the record unless it's sampled out.
+
+        :param record: log record.
+        """
+        if self.sampled_out(record):
+            return
+        try:
+            self.enqueue(self.prepare(record))
+        except queue.Full:
+            self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """
+        Put the record on the queue without waiting.
+
+        :param record: log record.
+        """
+        self.queue.put_nowait(record)
+
+
+def configure_logging() -> None:  # pragma: no cover
+    """
+    Route all logging through the background queue.
+
+    Safe to call several times; only the first call installs the handler.
+    """
+    global _listener  # noqa: PLW0603
+    if _listener is not None:
+        return
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(settings.log_queue_size)
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JSONFormatter())
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.addHandler(
+        BackgroundQueueHandler(
+            log_queue,
+            max_items=settings.log_max_items,
+            max_chars=settings.log_max_chars,
+            debug_sample_rate=settings.log_debug_sample_rate,
+        ),
+    )
+    root.setLevel(settings.log_level.value)
@@ -0,0 +1,109 @@
+"""
+Stage-level prometheus metrics.
+
+Only counters and histograms are used, so the values are aggregated
+correctly across uvicorn workers in prometheus multiprocess mode
+(see ``dyelog.__main__.set_multiproc_dir``).
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from prometheus_client import Counter, Histogram
+
+from dyelog.tracing import end_span, start_span
+
+STAGE_DURATION = Histogram(
+    "dyelog_stage_duration_seconds",
+    "Time spent in a stage of request processing.",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+CANDIDATE_WORDS = Histogram(
+    "dyelog_candidate_words",
+    "Number of dictionary words matching a letter pattern.",
+    buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+)
+LLM_TOKENS = Histogram(
+    "dyelog_llm_tokens",
+    "Prompt and response token counts of LLM calls.",
+    ["task", "kind"],
+    buckets=(16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192),
+)
+LLM_REQUESTS = Counter(
+    "dyelog_llm_requests",
+    "LLM calls by outcome.",
+    ["task", "outcome"],
+)
+CACHE_REQUESTS = Counter(
+    "dyelog_cache_requests",
+    "Cache lookups by result.",
+    ["cache", "result"],
+)
+FALLBACK_SCORES = Counter(
+    "dyelog_fallback_scores",
+    "Requests ranked locally instead of by the LLM, by reason.",
+    ["reason"],
+)
+SESSION_PREDICTIONS = Counter(
+    "dyelog_session_predictions",
+    "Keyboard session predictions by outcome "
+    "(sent, debounced, cancelled while running, error).",
+    ["outcome"],
+)
+CPU_TASKS = Counter(
+    "dyelog_cpu_tasks",
+    "CPU-bound tasks by where they ran (inline on the event loop or in the pool).",
+    ["task", "where"],
+)
+CIRCUIT_BREAKER_TRANSITIONS = Counter(
+    "dyelog_circuit_breaker_transitions",
+    "Circuit breaker state changes by new state.",
+    ["state"],
+)
+
+
+@contextmanager
+def observe_stage(stage: str) -> Iterator[None]:
+    """
+    Record how long the wrapped block took.
+
+    In traced requests the block is also recorded as a span.
+
+    :param stage: name of the stage.
+    :yield: nothing.
+    """
+    span = start_span(stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.labels(stage).observe(elapsed)
+        if span is not None:
+            end_span(span, elapsed)
+
+
+def observe_llm_response(task: str, response: Any) -> None:
+    """
+    Record the outcome and token counts of an Ollama chat response.
+
+    :param task: task the LLM was called for.
+    :param response: ollama chat response.
+    """
+    LLM_REQUESTS.labels(task, "cached" if response.get("cached") else "success").inc()
+    for kind, field in (("prompt", "prompt_eval_count"), ("response", "eval_count")):
+        count = response.get(field)
+        if count is not None:
+            LLM_TOKENS.labels(task, kind).observe(count)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """
+    Record a cache lookup.
+
+    :param cache: name of the cache.
+    :param hit: whether the lookup was a hit.
+    """
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
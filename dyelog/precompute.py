@@ -0,0 +1,138 @@
+"""
+Precompute predictions for a list of contexts.
+
+Every group pattern of up to ``--max-length`` ranges is matched against
+the dictionary, and the candidates are scored and turned into sentences
+by the LLM, exactly as ``/predict`` would do. The results are written
+to a table that ``/predict`` serves from when
+``DYELOG_PRECOMPUTED_FILE`` points at it::
+
+    python -m dyelog.precompute --contexts data/contexts.txt --output table.json.gz
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import sys
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from dyelog.utils import get_incremental_matcher
+from dyelog.web.api.chat import views
+from dyelog.web.api.chat.precomputed import PrecomputedTable, current_table_version
+
+logger = logging.getLogger(__name__)
+
+GROUPS = ("A-F", "G-M", "N-T", "U-Z")
+
+
+def group_patterns(max_length: int) -> Iterator[str]:
+    """
+    All group patterns of 1 to ``max_length`` ranges.
+
+    :param max_length: longest pattern.
+    :yield: patterns, shortest first.
+    """
+    for length in range(1, max_length + 1):
+        for groups in itertools.product(GROUPS, repeat=length):
+            yield " ".join(groups)
+
+
+async def precompute(
+    contexts: List[str],
+    max_length: int,
+    keep: int,
+    concurrency: int,
+) -> Tuple[PrecomputedTable, int]:
+    """
+    Build a table for the given contexts.
+
+    Entries the LLM fails for, e.g. while the circuit breaker is open,
+    are logged and left out, so a long run keeps everything else.
+
+    :param contexts: conversational contexts.
+    :param max_length: longest group pattern.
+    :param keep: scored words kept per entry.
+    :param concurrency: max LLM calls in flight.
+    :return: precomputed table and the number of entries left out.
+    """
+    table = PrecomputedTable(current_table_version())
+    matcher = get_incremental_matcher()
+    semaphore = asyncio.Semaphore(concurrency)
+    skipped = 0
+
+    async def run(context: str, pattern: str) -> None:
+        nonlocal skipped
+        words = matcher.query(pattern.split()).matches
+        if not words:
+            return
+        async with semaphore:
+            try:
+                scored_words = await views.score_words(words, context)
+                sentences = []
+                if scored_words:
+                    sentences = await views.generate_sentences(
+                        scored_words[0][0],
+                        context,
+                    )
+            except Exception as e:
+                logger.warning(f"Skipping {pattern} for {context!r}: {e!r}")
+                skipped += 1
+                return
+        table.add(context, pattern, scored_words[:keep], sentences)
+
+    await asyncio.gather(
+        *(
+            run(context, pattern)
+            for context in contexts
+            for pattern in group_patterns(max_length)
+        ),
+    )
+    return table, skipped
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entrypoint.
+
+    The table is written even if some entries failed; the exit status
+    is then 1.
+
+    :param argv: command line arguments.
+    :return: exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--contexts",
+        type=Path,
+        required=True,
+        help="file with one context per line",
+    )
+    parser.add_argument("--output", type=Path, required=True)
+    parser.add_argument("--max-length", type=int, default=3)
+    parser.add_argument("--keep", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    contexts = [
+        line.strip() for line in args.contexts.read_text().splitlines() if line.strip()
+    ]
+    try:
+        table, skipped = asyncio.run(
+            precompute(contexts, args.max_length, args.keep, args.concurrency),
+        )
+    except Exception as e:
+        logger.error(f"Precomputing failed: {e}")
+        return 1
+    table.save(args.output)
+    logger.info("Wrote %d predictions to %s", len(table), args.output)
+    if skipped:
+        logger.warning("Skipped %d predictions the LLM failed for", skipped)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+"""LLM client for dyelog."""
+
+from dyelog.services.llm.cache import LLMCache, get_llm_cache
+from dyelog.services.llm.client import (
+    Deadline,
+    LLMUnavailableError,
+    chat,
+    get_circuit_breaker,
+    get_ollama_client,
+    get_task_model,
+)
+from dyelog.services.llm.traffic import (
+    TrafficRecorder,
+    get_traffic_recorder,
+    load_traffic,
+)
+
+__all__ = [
+    "Deadline",
+    "LLMCache",
+    "LLMUnavailableError",
+    "TrafficRecorder",
+    "chat",
+    "get_circuit_breaker",
+    "get_llm_cache",
+    "get_ollama_client",
+    "get_task_model",
+    "get_traffic_recorder",
+    "load_traffic",
+]
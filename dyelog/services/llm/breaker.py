@@ -0,0 +1,85 @@
+import threading
+import time
+from typing import Callable
+
+from dyelog.metrics import CIRCUIT_BREAKER_TRANSITIONS
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for a flaky backend.
+
+    After ``failure_threshold`` consecutive failures the breaker opens and
+    calls fail fast for ``reset_timeout`` seconds. Then a single probe
+    call is let through: success closes the breaker, failure opens it
+    again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go to the backend now.
+
+        :return: False while the breaker is open.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self.clock() - self._opened_at < self.reset_timeout:
+                    return False
+                self._transition(HALF_OPEN)
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        """Report a successful call."""
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        """Report a failed call."""
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = self.clock()
+                if self.state != OPEN:
+                    self._transition(OPEN)
+
+    def release(self) -> None:
+        """
+        Report a call that ended without telling anything about the backend.
+
+        Used for cancelled calls and calls cut short by the caller's own
+        deadline; a half-open breaker lets the next call probe instead.
+        """
+        with self._lock:
+            self._probing = False
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        CIRCUIT_BREAKER_TRANSITIONS.labels(state).inc()
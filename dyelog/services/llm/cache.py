@@ -0,0 +1,174 @@
+"""
+Cache of LLM replies shared by all workers on a host.
+
+Replies are stored in a SQLite database in WAL mode, so every uvicorn
+worker reads and writes the same cache without blocking readers, and
+the cache survives restarts and deploys. Entries expire after ``ttl``
+seconds; beyond ``max_entries`` the entries closest to expiring (the
+oldest) are dropped. Eviction runs every ``evict_every`` writes, so the
+cache can briefly hold a few more entries than ``max_entries``.
+
+Errors of the cache are logged and treated as misses; the cache never
+fails an LLM call.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from dyelog.settings import ModelConfig, settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS llm_cache_expires_at ON llm_cache (expires_at);
+"""
+
+
+def cache_key(task: Optional[str], model: ModelConfig, prompt: str) -> str:
+    """
+    Key of a reply.
+
+    :param task: LLM task.
+    :param model: model and options the prompt is sent with.
+    :param prompt: user message.
+    :return: hex digest.
+    """
+    digest = hashlib.sha256()
+    for part in (task or "", model.model_dump_json(exclude_none=True), prompt):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite-backed cache of LLM reply contents.
+
+    Every thread gets a connection of its own and no Python lock is held
+    around queries: in WAL mode lookups never wait for writers, so a
+    lookup on the event loop isn't delayed by a write of another thread
+    or worker waiting for SQLite's write lock.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ttl: float,
+        max_entries: int,
+        evict_every: int = 100,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection: Optional[sqlite3.Connection] = getattr(
+            self._local,
+            "connection",
+            None,
+        )
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path,
+                timeout=1.0,
+                isolation_level=None,
+            )
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a reply.
+
+        :param key: key from :func:`cache_key`.
+        :return: reply content or None if it isn't cached or expired.
+        """
+        try:
+            row = (
+                self._connection()
+                .execute(
+                    "SELECT content FROM llm_cache WHERE key = ? AND expires_at > ?",
+                    (key, time.time()),
+                )
+                .fetchone()
+            )
+        except sqlite3.Error:
+            logger.warning("LLM cache lookup failed", exc_info=True)
+            return None
+        return None if row is None else row[0]
+
+    def set(self, key: str, content: str) -> None:
+        """
+        Store a reply, replacing any previous one.
+
+        Writes can wait up to a second for other workers, so they
+        shouldn't run on the event loop.
+
+        :param key: key from :func:`cache_key`.
+        :param content: reply content.
+        """
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?)",
+                (key, content, time.time() + self.ttl),
+            )
+            with self._lock:
+                self._writes += 1
+                evict = self._writes % self.evict_every == 0
+            if evict:
+                self.evict()
+        except sqlite3.Error:
+            logger.warning("LLM cache write failed", exc_info=True)
+
+    def __len__(self) -> int:
+        row = self._connection().execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        return int(row[0])
+
+    def evict(self) -> None:
+        """Drop expired entries and the oldest ones beyond ``max_entries``."""
+        connection = self._connection()
+        connection.execute(
+            "DELETE FROM llm_cache WHERE expires_at <= ?",
+            (time.time(),),
+        )
+        connection.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
+@lru_cache(maxsize=None)
+def get_llm_cache() -> Optional[LLMCache]:
+    """
+    Get the cache configured by ``settings.llm_cache_file``.
+
+    :return: LLM cache or None if caching is off.
+    """
+    if settings.llm_cache_file is None:
+        return None
+    return LLMCache(
+        settings.llm_cache_file,
+        ttl=settings.llm_cache_ttl_seconds,
+        max_entries=settings.llm_cache_max_entries,
+    )
@@ -0,0 +1,215 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from dyelog.metrics import observe_stage, record_cache
+from dyelog.services.llm.breaker import CircuitBreaker
+from dyelog.services.llm.cache import cache_key, get_llm_cache
+from dyelog.services.llm.traffic import get_traffic_recorder
+from dyelog.settings import ModelConfig, settings
+from dyelog.tracing import annotate, is_traced
+
+if TYPE_CHECKING:
+    from ollama import AsyncClient
+
+
+class LLMUnavailableError(Exception):
+    """
+    The LLM could not answer in time.
+
+    ``reason`` is one of ``circuit_open``, ``budget_exhausted`` or ``error``.
+    """
+
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+@dataclass(frozen=True)
+class Deadline:
+    """Point in time by which a request has to be answered."""
+
+    expires_at: float
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        """
+        Deadline ``seconds`` from now.
+
+        :param seconds: latency budget.
+        :return: deadline.
+        """
+        return cls(time.monotonic() + seconds)
+
+    def remaining(self) -> float:
+        """
+        Seconds left until the deadline.
+
+        :return: remaining time, never negative.
+        """
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+@lru_cache(maxsize=None)
+def get_ollama_client() -> "AsyncClient":
+    """
+    Get the Ollama client.
+
+    The client is created on first use.
+
+    :return: ollama client.
+    """
+    from ollama import AsyncClient
+
+    return AsyncClient(
+        host=settings.ollama_host,
+        timeout=settings.ollama_timeout_seconds,
+    )
+
+
+@lru_cache(maxsize=None)
+def get_circuit_breaker() -> CircuitBreaker:
+    """
+    Get the circuit breaker guarding the Ollama client.
+
+    :return: circuit breaker.
+    """
+    return CircuitBreaker(
+        failure_threshold=settings.ollama_breaker_failures,
+        reset_timeout=settings.ollama_breaker_reset_seconds,
+    )
+
+
+def get_task_model(task: Optional[str]) -> ModelConfig:
+    """
+    Model and options used for an LLM task.
+
+    :param task: task name, e.g. ``score_words``.
+    :return: the task's entry in ``settings.ollama_task_models``,
+        ``settings.ollama_model`` with default options if it has none.
+    """
+    if task in settings.ollama_task_models:
+        return settings.ollama_task_models[task]
+    return ModelConfig(model=settings.ollama_model)
+
+
+def ollama_timings(response: Any) -> Dict[str, Any]:
+    """
+    Token counts and Ollama's own timings of a chat response.
+
+    Whatever the span takes beyond ``ollama_total_ms`` was spent queueing
+    in Ollama and on the wire.
+
+    :param response: ollama chat response.
+    :return: span attributes.
+    """
+    timings: Dict[str, Any] = {
+        "prompt_tokens": response.get("prompt_eval_count"),
+        "response_tokens": response.get("eval_count"),
+    }
+    for name in ("total", "load", "prompt_eval", "eval"):
+        duration = response.get(f"{name}_duration")
+        if duration is not None:
+            timings[f"ollama_{name}_ms"] = duration / 1e6
+    return timings
+
+
+async def _send(prompt: str, model: ModelConfig, deadline: Optional[Deadline]) -> Any:
+    """Call Ollama through the circuit breaker within the deadline."""
+    timeout = None if deadline is None else deadline.remaining()
+    if timeout is not None and timeout <= 0:
+        raise LLMUnavailableError("budget_exhausted")
+    breaker = get_circuit_breaker()
+    if not breaker.allow():
+        raise LLMUnavailableError("circuit_open")
+    try:
+        with observe_stage("ollama_chat"):
+            response = await asyncio.wait_for(
+                get_ollama_client().chat(
+                    model=model.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    stream=False,
+                    options=model.options() or None,
+                ),
+                timeout,
+            )
+            if is_traced():
+                annotate(model=model.model, **ollama_timings(response))
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    except asyncio.TimeoutError as e:
+        if deadline is None or deadline.remaining() > 0:
+            breaker.record_failure()
+            raise LLMUnavailableError("error") from e
+        breaker.release()
+        raise LLMUnavailableError("budget_exhausted") from None
+    except Exception as e:
+        breaker.record_failure()
+        raise LLMUnavailableError("error") from e
+    breaker.record_success()
+    return response
+
+
+async def chat(
+    prompt: str,
+    deadline: Optional[Deadline] = None,
+    task: Optional[str] = None,
+    cache: bool = True,
+) -> Any:
+    """
+    Send a single-message chat to Ollama within the request's budget.
+
+    The model is chosen by ``task`` (see :func:`get_task_model`). If the
+    shared LLM cache is on, cached replies are returned without calling
+    Ollama; they are marked with ``"cached": True``. Fails fast while
+    the circuit breaker is open. Timeouts and errors are reported to the
+    breaker and raised as :class:`LLMUnavailableError`, except for the
+    caller's own deadline running out and cancellation, which say
+    nothing about Ollama. Successful calls are cached and recorded if
+    traffic recording is on.
+
+    :param prompt: user message.
+    :param deadline: deadline of the request, if any.
+    :param task: LLM task the prompt is for.
+    :param cache: whether a cached reply may be used; a fresh one is
+        cached either way.
+    :raises LLMUnavailableError: if the LLM can't answer in time.
+    :return: ollama chat response.
+    """
+    model = get_task_model(task)
+    llm_cache = get_llm_cache()
+    key = None
+    if llm_cache is not None:
+        key = cache_key(task, model, prompt)
+        content = llm_cache.get(key) if cache else None
+        record_cache("llm", content is not None)
+        if content is not None:
+            return {
+                "message": {"role": "assistant", "content": content},
+                "cached": True,
+            }
+    start = time.perf_counter()
+    response = await _send(prompt, model, deadline)
+    if llm_cache is not None and key is not None:
+        # Written in the background; the reply doesn't wait for the disk.
+        asyncio.get_running_loop().run_in_executor(
+            None,
+            llm_cache.set,
+            key,
+            response["message"]["content"],
+        )
+    recorder = get_traffic_recorder()
+    if recorder is not None:
+        recorder.record(
+            {
+                "task": task,
+                "model": model.model_dump(exclude_none=True),
+                "prompt": prompt,
+                "latency_ms": (time.perf_counter() - start) * 1000,
+                "content": response["message"]["content"],
+            },
+        )
+    return response
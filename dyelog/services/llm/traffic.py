@@ -0,0 +1,98 @@
+"""
+Recording of LLM calls.
+
+With ``settings.llm_traffic_file`` set, every (sampled) successful LLM
+call is appended to that file as a JSON line with its task, model,
+prompt, latency and reply. ``benchmarks.compare_models`` replays the
+recorded prompts against other models. Lines are written by a
+background thread; calls that don't fit in the queue aren't recorded.
+"""
+
+import atexit
+import queue
+import random
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+import ujson
+
+from dyelog.settings import settings
+
+_STOP = None
+
+
+class TrafficRecorder:
+    """Appends recorded LLM calls to a JSON lines file."""
+
+    def __init__(
+        self,
+        path: Path,
+        sample_rate: float = 1.0,
+        queue_size: int = 1000,
+    ) -> None:
+        self.path = path
+        self.sample_rate = sample_rate
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(queue_size)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        """
+        Queue a call for writing unless it's sampled out.
+
+        :param entry: recorded call.
+        """
+        if random.random() >= self.sample_rate:  # noqa: S311
+            return
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """Write the queued calls and stop the writer thread."""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self) -> None:
+        with self.path.open("a") as f:
+            while True:
+                entry = self._queue.get()
+                if entry is _STOP:
+                    return
+                f.write(ujson.dumps(entry) + "\n")
+                if self._queue.empty():
+                    f.flush()
+
+
+@lru_cache(maxsize=None)
+def get_traffic_recorder() -> Optional[TrafficRecorder]:
+    """
+    Get the recorder configured by ``settings.llm_traffic_file``.
+
+    :return: traffic recorder or None if recording is off.
+    """
+    if settings.llm_traffic_file is None:
+        return None
+    recorder = TrafficRecorder(
+        settings.llm_traffic_file,
+        settings.llm_traffic_sample_rate,
+    )
+    atexit.register(recorder.close)
+    return recorder
+
+
+def load_traffic(path: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Read recorded calls.
+
+    :param path: file written by :class:`TrafficRecorder`.
+    :yield: recorded calls, oldest first.
+    """
+    with path.open() as f:
+        for line in f:
+            if line.strip():
+                yield ujson.loads(line)
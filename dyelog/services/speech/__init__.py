@@ -0,0 +1,46 @@
+"""Speech recognition and synthesis backends."""
+
+from functools import lru_cache
+
+from dyelog.services.speech.base import (
+    RECOGNITION_ENCODINGS,
+    SYNTHESIS_ENCODINGS,
+    VOICES,
+    RecognitionConfig,
+    SpeechBackend,
+    SynthesisConfig,
+    Transcript,
+)
+from dyelog.settings import settings
+
+
+@lru_cache(maxsize=None)
+def get_speech_backend() -> SpeechBackend:
+    """
+    Get the configured speech backend.
+
+    The backend is created on first use, so the cloud SDK is only
+    imported when it's actually needed.
+
+    :return: speech backend instance.
+    """
+    if settings.speech_backend == "local":
+        from dyelog.services.speech.local import LocalSpeechBackend
+
+        return LocalSpeechBackend(latency=settings.speech_local_latency_seconds)
+
+    from dyelog.services.speech.google_cloud import GoogleSpeechBackend
+
+    return GoogleSpeechBackend(max_buffered_chunks=settings.speech_stream_buffer_size)
+
+
+__all__ = [
+    "RECOGNITION_ENCODINGS",
+    "SYNTHESIS_ENCODINGS",
+    "VOICES",
+    "SpeechBackend",
+    "RecognitionConfig",
+    "SynthesisConfig",
+    "Transcript",
+    "get_speech_backend",
+]
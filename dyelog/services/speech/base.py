@@ -0,0 +1,119 @@
+import abc
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+# Voice genders understood by every backend.
+VOICES = ("FEMALE", "MALE", "NEUTRAL", "UNKNOWN")
+# Encodings accepted for recognition.
+RECOGNITION_ENCODINGS = (
+    "LINEAR16",
+    "FLAC",
+    "MULAW",
+    "AMR",
+    "AMR_WB",
+    "OGG_OPUS",
+    "SPEEX_WITH_HEADER_BYTE",
+    "MP3",
+    "WEBM_OPUS",
+)
+# Encodings produced by synthesis, with their media type and file extension.
+SYNTHESIS_ENCODINGS = {
+    "MP3": ("audio/mp3", "mp3"),
+    "OGG_OPUS": ("audio/ogg", "ogg"),
+    "LINEAR16": ("audio/wav", "wav"),
+    "MULAW": ("audio/wav", "wav"),
+    "ALAW": ("audio/wav", "wav"),
+}
+
+
+@dataclass(frozen=True)
+class RecognitionConfig:
+    """Recognition parameters for a single request or streaming session."""
+
+    language_code: str = "en-US"
+    encoding: str = "MP3"
+    sample_rate_hertz: int = 16000
+    interim_results: bool = True
+
+
+@dataclass(frozen=True)
+class SynthesisConfig:
+    """Voice parameters for speech synthesis."""
+
+    voice: str = "FEMALE"
+    language_code: str = "en-US"
+    encoding: str = "MP3"
+    # None lets the backend pick the natural rate of the voice
+    sample_rate_hertz: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class Transcript:
+    """A (possibly interim) transcript produced by a recognizer."""
+
+    text: str
+    confidence: float
+    is_final: bool
+
+
+class SpeechBackend(abc.ABC):
+    """Interface for speech recognition and synthesis backends."""
+
+    @abc.abstractmethod
+    async def synthesize(self, text: str, config: SynthesisConfig) -> bytes:
+        """
+        Synthesize speech for a piece of text.
+
+        :param text: text to speak.
+        :param config: voice parameters.
+        :return: encoded audio.
+        """
+
+    async def synthesize_stream(
+        self,
+        text: str,
+        config: SynthesisConfig,
+        chunk_size: int,
+    ) -> AsyncIterator[bytes]:
+        """
+        Synthesize speech and yield the audio in chunks.
+
+        Backends that can produce audio incrementally should override this;
+        the default splits the result of :meth:`synthesize`.
+
+        :param text: text to speak.
+        :param config: voice parameters.
+        :param chunk_size: max size of a yielded chunk.
+        :yield: consecutive pieces of the encoded audio.
+        """
+        audio = await self.synthesize(text, config)
+        for start in range(0, len(audio), chunk_size):
+            yield audio[start : start + chunk_size]
+
+    @abc.abstractmethod
+    async def recognize(
+        self,
+        audio: bytes,
+        config: RecognitionConfig,
+    ) -> Optional[Transcript]:
+        """
+        Recognize speech in a complete recording.
+
+        :param audio: encoded audio.
+        :param config: recognition parameters.
+        :return: the most likely transcript or None if nothing was recognized.
+        """
+
+    @abc.abstractmethod
+    def streaming_recognize(
+        self,
+        audio: AsyncIterator[bytes],
+        config: RecognitionConfig,
+    ) -> AsyncIterator[Transcript]:
+        """
+        Recognize speech while audio is still arriving.
+
+        :param audio: audio chunks in the order they were recorded.
+        :param config: recognition parameters.
+        :return: interim and final transcripts as soon as they are available.
+        """
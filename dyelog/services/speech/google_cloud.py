@@ -0,0 +1,243 @@
+import asyncio
+import queue
+import threading
+from typing import AsyncIterator, Callable, Iterator, Optional, Union
+
+from google.cloud import speech, texttospeech
+
+from dyelog.services.speech.base import (
+    RecognitionConfig,
+    SpeechBackend,
+    SynthesisConfig,
+    Transcript,
+)
+
+_DONE = object()
+_VOICES = {
+    "FEMALE": texttospeech.SsmlVoiceGender.FEMALE,
+    "MALE": texttospeech.SsmlVoiceGender.MALE,
+    "NEUTRAL": texttospeech.SsmlVoiceGender.NEUTRAL,
+    "UNKNOWN": texttospeech.SsmlVoiceGender.SSML_VOICE_GENDER_UNSPECIFIED,
+}
+
+
+async def _put(
+    requests: "queue.Queue[Optional[bytes]]",
+    item: Optional[bytes],
+    closed: threading.Event,
+    space: asyncio.Event,
+) -> None:
+    """
+    Put an item into the request queue unless the stream is already closed.
+
+    While the queue is full, waits on the event loop until the gRPC thread
+    signals ``space``, which is what applies backpressure to the
+    websocket reader.
+    """
+    while not closed.is_set():
+        try:
+            requests.put_nowait(item)
+            return
+        except queue.Full:
+            space.clear()
+            # The gRPC thread may have made room before the clear.
+            if requests.full():
+                await space.wait()
+
+
+def _requests(
+    requests: "queue.Queue[Optional[bytes]]",
+    closed: threading.Event,
+    on_get: Callable[[], None],
+) -> Iterator[speech.StreamingRecognizeRequest]:
+    """
+    Turn queued audio chunks into recognition requests until the stream ends.
+
+    ``on_get`` is called whenever a chunk is taken, so the producer knows
+    there is room in the queue again.
+    """
+    while True:
+        try:
+            chunk = requests.get(timeout=0.1)
+        except queue.Empty:
+            if closed.is_set():
+                return
+            continue
+        on_get()
+        if chunk is None:
+            return
+        yield speech.StreamingRecognizeRequest(audio_content=chunk)
+
+
+class GoogleSpeechBackend(SpeechBackend):
+    """Speech backend using Google Cloud Speech-to-Text and Text-to-Speech."""
+
+    def __init__(self, max_buffered_chunks: int = 32) -> None:
+        self.max_buffered_chunks = max_buffered_chunks
+        self.stt_client = speech.SpeechClient()
+        self.tts_client = texttospeech.TextToSpeechClient()
+
+    async def synthesize(self, text: str, config: SynthesisConfig) -> bytes:
+        """
+        Synthesize speech with Google Text-to-Speech.
+
+        The client call is blocking, so it runs in a worker thread to let
+        several syntheses proceed concurrently.
+
+        :param text: text to speak.
+        :param config: voice parameters.
+        :return: encoded audio.
+        """
+        audio_config = texttospeech.AudioConfig(
+            audio_encoding=getattr(texttospeech.AudioEncoding, config.encoding),
+        )
+        if config.sample_rate_hertz is not None:
+            audio_config.sample_rate_hertz = config.sample_rate_hertz
+        response = await asyncio.to_thread(
+            self.tts_client.synthesize_speech,
+            input=texttospeech.SynthesisInput(text=text),
+            voice=texttospeech.VoiceSelectionParams(
+                language_code=config.language_code,
+                ssml_gender=_VOICES[config.voice],
+            ),
+            audio_config=audio_config,
+        )
+        return response.audio_content
+
+    async def recognize(
+        self,
+        audio: bytes,
+        config: RecognitionConfig,
+    ) -> Optional[Transcript]:
+        """
+        Recognize a complete recording with Google Speech-to-Text.
+
+        :param audio: encoded audio.
+        :param config: recognition parameters.
+        :return: the most likely transcript or None if nothing was recognized.
+        """
+        response = await asyncio.to_thread(
+            self.stt_client.recognize,
+            config=self._recognition_config(config),
+            audio=speech.RecognitionAudio(content=audio),
+        )
+        if not response.results:
+            return None
+        alternative = response.results[0].alternatives[0]
+        return Transcript(
+            text=alternative.transcript,
+            confidence=alternative.confidence,
+            is_final=True,
+        )
+
+    def _recognition_config(
+        self,
+        config: RecognitionConfig,
+    ) -> speech.RecognitionConfig:
+        return speech.RecognitionConfig(
+            encoding=getattr(speech.RecognitionConfig.AudioEncoding, config.encoding),
+            sample_rate_hertz=config.sample_rate_hertz,
+            language_code=config.language_code,
+            enable_automatic_punctuation=True,
+        )
+
+    def _recognize(
+        self,
+        streaming_config: speech.StreamingRecognitionConfig,
+        requests: "queue.Queue[Optional[bytes]]",
+        closed: threading.Event,
+        on_get: Callable[[], None],
+    ) -> Iterator[Transcript]:
+        """Run the blocking gRPC stream, yielding the top alternative of each result."""
+        # The speech helper mixin takes the config separately from the requests.
+        responses = self.stt_client.streaming_recognize(  # type: ignore
+            config=streaming_config,
+            requests=_requests(requests, closed, on_get),
+        )
+        for response in responses:
+            for result in response.results:
+                if not result.alternatives:
+                    continue
+                alternative = result.alternatives[0]
+                yield Transcript(
+                    text=alternative.transcript,
+                    confidence=alternative.confidence,
+                    is_final=result.is_final,
+                )
+
+    async def streaming_recognize(
+        self,
+        audio: AsyncIterator[bytes],
+        config: RecognitionConfig,
+    ) -> AsyncIterator[Transcript]:
+        """
+        Stream audio to Google and yield transcripts as they come back.
+
+        The gRPC client is synchronous, so the call runs on a thread of
+        its own for the lifetime of the stream; it doesn't take a thread
+        of the default executor, which other blocking calls need. Audio is
+        handed over through a bounded queue without a thread hop per
+        chunk: while the queue is full the feeder waits on the event loop
+        until the gRPC thread takes a chunk. This keeps memory per
+        connection limited to ``max_buffered_chunks`` chunks.
+
+        :param audio: audio chunks in the order they were recorded.
+        :param config: recognition parameters.
+        :yield: interim and final transcripts.
+        """
+        loop = asyncio.get_running_loop()
+        requests: "queue.Queue[Optional[bytes]]" = queue.Queue(
+            maxsize=self.max_buffered_chunks,
+        )
+        results: "asyncio.Queue[Union[Transcript, BaseException, object]]" = (
+            asyncio.Queue()
+        )
+        closed = threading.Event()
+        space = asyncio.Event()
+        streaming_config = speech.StreamingRecognitionConfig(
+            config=self._recognition_config(config),
+            interim_results=config.interim_results,
+        )
+
+        def on_get() -> None:
+            loop.call_soon_threadsafe(space.set)
+
+        def run() -> None:
+            try:
+                for transcript in self._recognize(
+                    streaming_config,
+                    requests,
+                    closed,
+                    on_get,
+                ):
+                    loop.call_soon_threadsafe(results.put_nowait, transcript)
+            except Exception as e:
+                loop.call_soon_threadsafe(results.put_nowait, e)
+            finally:
+                closed.set()
+                loop.call_soon_threadsafe(space.set)
+                loop.call_soon_threadsafe(results.put_nowait, _DONE)
+
+        async def feed() -> None:
+            try:
+                async for chunk in audio:
+                    await _put(requests, chunk, closed, space)
+            finally:
+                await _put(requests, None, closed, space)
+
+        worker = threading.Thread(target=run, name="google-stt-stream", daemon=True)
+        worker.start()
+        feeder = asyncio.create_task(feed())
+        try:
+            while True:
+                item = await results.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item  # type: ignore
+        finally:
+            # The gRPC thread ends on its own once it sees ``closed``.
+            closed.set()
+            feeder.cancel()
+            await asyncio.gather(feeder, return_exceptions=True)
@@ -0,0 +1,75 @@
+import asyncio
+from typing import AsyncIterator, List, Optional
+
+from dyelog.services.speech.base import (
+    RecognitionConfig,
+    SpeechBackend,
+    SynthesisConfig,
+    Transcript,
+)
+
+
+class LocalSpeechBackend(SpeechBackend):
+    """
+    Offline stand-in for the cloud speech services.
+
+    Audio chunks are decoded as UTF-8 text and synthesized "audio" is the
+    UTF-8 encoded text, so tests and local development can drive the
+    speech endpoints without credentials. ``latency`` seconds are added
+    to every synthesis and recognition to mimic the cloud round trip in
+    load tests.
+    """
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+
+    async def synthesize(self, text: str, config: SynthesisConfig) -> bytes:
+        """
+        Return the text itself as audio.
+
+        :param text: text to speak.
+        :param config: voice parameters.
+        :return: UTF-8 encoded text.
+        """
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return text.encode("utf-8")
+
+    async def recognize(
+        self,
+        audio: bytes,
+        config: RecognitionConfig,
+    ) -> Optional[Transcript]:
+        """
+        Return the decoded audio as the transcript.
+
+        :param audio: audio, treated as UTF-8 text.
+        :param config: recognition parameters.
+        :return: transcript or None for empty audio.
+        """
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        text = " ".join(audio.decode("utf-8", errors="ignore").split())
+        if not text:
+            return None
+        return Transcript(text=text, confidence=1.0, is_final=True)
+
+    async def streaming_recognize(
+        self,
+        audio: AsyncIterator[bytes],
+        config: RecognitionConfig,
+    ) -> AsyncIterator[Transcript]:
+        """
+        Echo the received audio back as transcripts.
+
+        :param audio: audio chunks, treated as UTF-8 text.
+        :param config: recognition parameters.
+        :yield: an interim transcript per chunk and a final one at the end.
+        """
+        words: List[str] = []
+        async for chunk in audio:
+            words.extend(chunk.decode("utf-8", errors="ignore").split())
+            if config.interim_results:
+                yield Transcript(text=" ".join(words), confidence=0.0, is_final=False)
+        if words:
+            yield Transcript(text=" ".join(words), confidence=1.0, is_final=True)
@@ -1,8 +1,9 @@
 import enum
 from pathlib import Path
 from tempfile import gettempdir
+from typing import Any, Dict, Optional
 
-from google.cloud import texttospeech
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 TEMP_DIR = Path(gettempdir())
@@ -19,6 +20,24 @@ class LogLevel(str, enum.Enum):
     FATAL = "FATAL"
 
 
+class ModelConfig(BaseModel):
+    """
+    Ollama model and generation options of one LLM task.
+
+    The quantization is part of the model tag,
+    e.g. ``llama3.2:1b-instruct-q4_K_M``.
+    """
+
+    model: str
+    num_ctx: Optional[int] = None
+    num_predict: Optional[int] = None
+    temperature: Optional[float] = None
+
+    def options(self) -> Dict[str, Any]:
+        """Options passed to Ollama; unset ones keep the model defaults."""
+        return self.model_dump(exclude={"model"}, exclude_none=True)
+
+
 class Settings(BaseSettings):
     """
     Application settings.
@@ -35,12 +54,103 @@ class Settings(BaseSettings):
     reload: bool = False
     ollama_host: str = "http://127.0.0.1:11434"
     ollama_model: str = "llama3.2:3b-instruct-fp16"
-    voice: int = texttospeech.SsmlVoiceGender.SSML_VOICE_GENDER_UNSPECIFIED
+    # Model per LLM task ("score_words", "generate_sentences"), e.g.
+    # '{"score_words": {"model": "llama3.2:1b-instruct-q4_K_M", "temperature": 0}}'.
+    # Tasks not listed use ollama_model.
+    ollama_task_models: Dict[str, ModelConfig] = {}
+    # JSON lines file LLM calls are recorded to, for benchmarks.compare_models
+    llm_traffic_file: Optional[Path] = None
+    # Fraction of LLM calls recorded
+    llm_traffic_sample_rate: float = 1.0
+    # SQLite file caching LLM replies across workers and restarts; off if unset
+    llm_cache_file: Optional[Path] = None
+    # How long cached replies are used and how many are kept
+    llm_cache_ttl_seconds: float = 24 * 3600.0
+    llm_cache_max_entries: int = 100_000
+    # Hard timeout of a single Ollama HTTP request
+    ollama_timeout_seconds: float = 60.0
+    # Consecutive failures that open the Ollama circuit breaker
+    ollama_breaker_failures: int = 3
+    # Seconds the breaker stays open before a probe request is allowed
+    ollama_breaker_reset_seconds: float = 30.0
+    # Default latency budget of /predict; the local ranking is used past it
+    predict_budget_seconds: float = 10.0
+    # Max items and concurrent predictions of a /predict/batch request
+    predict_batch_max_items: int = 64
+    predict_batch_concurrency: int = 4
+    # Prompt options returned by /predict; the rest is paged with a cursor
+    predict_top_k: int = 4
+    # SQLite file the ranked lists behind cursors are shared through by all
+    # workers of a host
+    prompt_cursor_file: Path = TEMP_DIR / "dyelog-cursors.sqlite3"
+    # How long and how many ranked lists are kept for cursor paging
+    prompt_cursor_ttl_seconds: float = 120.0
+    prompt_cursor_max_entries: int = 1024
+    # Quiet period before a keyboard session update triggers predictions
+    session_debounce_seconds: float = 0.15
+    # Default voice gender for speech synthesis
+    voice: str = "FEMALE"
+    # Speech backend: "google" or "local" (offline stand-in)
+    speech_backend: str = "google"
+    # Simulated latency of the local speech backend
+    speech_local_latency_seconds: float = 0.0
+    # Max audio chunks buffered per streaming connection
+    speech_stream_buffer_size: int = 32
+    # Max size of a single audio chunk sent over the websocket
+    speech_stream_max_chunk_bytes: int = 64 * 1024
+    # Size of the chunks synthesized audio is streamed back in
+    tts_stream_chunk_bytes: int = 16 * 1024
+    # Max texts in a single batch synthesis request
+    tts_batch_max_items: int = 8
+    # Max concurrent syntheses per batch request
+    tts_batch_concurrency: int = 4
     # Current environment
     environment: str = "dev"
 
     log_level: LogLevel = LogLevel.DEBUG
+    # Records waiting for the background log writer; more are dropped
+    log_queue_size: int = 10000
+    # Max list items and string length kept in structured log fields
+    log_max_items: int = 20
+    log_max_chars: int = 2000
+    # Fraction of DEBUG records that are written
+    log_debug_sample_rate: float = 1.0
+    # Allow request tracing (header or sampling); off removes the middleware
+    trace_enabled: bool = True
+    # Request header that asks for a trace ("1") or a trace with CPU profile ("profile")
+    # (honored only on requests carrying the admin token)
+    trace_header: str = "X-Dyelog-Trace"
+    # Fraction of requests traced without the header, and of those profiled
+    trace_sample_rate: float = 0.0
+    trace_profile_rate: float = 0.0
+    # Stack sampling interval and number of stacks kept per profile
+    trace_profile_interval_seconds: float = 0.005
+    trace_profile_max_stacks: int = 50
+    # Recent traces kept per worker for the admin endpoint
+    trace_buffer_size: int = 200
+    # Bearer token of the admin endpoints; they are disabled without one
+    admin_token: Optional[str] = None
     words_file: Path = Path("data/words_alpha.txt")
+    # Name requests use for words_file
+    default_dictionary: str = "en"
+    # Extra word lists by name, e.g. '{"es": "data/words_es.txt"}'
+    dictionaries: Dict[str, Path] = {}
+    # Memory budget of all loaded dictionary indexes; least recently used are evicted.
+    # Cached prefix states aren't counted, see match_cache_max_words.
+    dictionary_memory_mb: int = 512
+    # Table written by `python -m dyelog.precompute`, served without the LLM
+    precomputed_file: Optional[Path] = None
+    # Model written by `python -m dyelog.utils.ngram` for next-word predictions
+    ngram_file: Optional[Path] = None
+    # Frequency-ordered word list for the local fallback ranking
+    frequency_file: Path = Path("data/words.txt")
+    # Word references kept by the incremental matcher across all cached prefixes,
+    # per loaded dictionary
+    match_cache_max_words: int = 2_000_000
+    # Threads running matching and local ranking off the event loop
+    cpu_pool_workers: int = 2
+    # Work below this many word references runs inline on the event loop
+    cpu_offload_min_words: int = 20_000
     # This variable is used to define
     # multiproc_dir. It's required for [uvi|guni]corn projects.
     prometheus_dir: Path = TEMP_DIR / "prom"
@@ -0,0 +1,344 @@
+"""
+Opt-in per-request traces.
+
+A request is traced when it carries the ``settings.trace_header`` header
+along with the admin token, or is picked by ``settings.trace_sample_rate``. Every
+:func:`dyelog.metrics.observe_stage` block of a traced request becomes a
+span, nested by the task structure of the request. A traced request can
+also get a sampled CPU profile of the event loop thread.
+
+When a request isn't traced the only cost is a context variable lookup
+per stage, and with ``settings.trace_enabled`` off the middleware isn't
+installed at all.
+"""
+
+import random
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Deque, Dict, List, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from dyelog.settings import settings
+
+_trace: ContextVar[Optional["Trace"]] = ContextVar("trace", default=None)
+_span: ContextVar[Optional["Span"]] = ContextVar("span", default=None)
+
+
+@dataclass
+class Span:
+    """A timed stage of a traced request."""
+
+    name: str
+    start_ms: float
+    depth: int
+    duration_ms: Optional[float] = None
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    # Restores the parent span when this one ends
+    token: Optional["Token[Optional[Span]]"] = field(default=None, repr=False)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Render the span for the admin endpoint.
+
+        :return: span as plain data.
+        """
+        return {
+            "name": self.name,
+            "start_ms": self.start_ms,
+            "duration_ms": self.duration_ms,
+            "depth": self.depth,
+            "attrs": self.attrs,
+        }
+
+
+class StackSampler:
+    """
+    Samples the stack of one thread at a fixed interval.
+
+    The samples are aggregated into collapsed stacks (``a;b;c``, as used
+    by flame graph tools). Coroutines of other requests running on the
+    same event loop show up as well.
+    """
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = 0
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        """Start sampling."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampler thread."""
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)  # noqa: SLF001
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples += 1
+            self.stacks[";".join(reversed(names))] += 1
+
+    def report(self, max_stacks: int) -> Dict[str, Any]:
+        """
+        Most frequent stacks.
+
+        :param max_stacks: max stacks returned.
+        :return: sampling interval, sample count and collapsed stacks.
+        """
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "stacks": self.stacks.most_common(max_stacks),
+        }
+
+
+class Trace:
+    """Spans recorded for a single request."""
+
+    def __init__(self, method: str, path: str) -> None:
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.started_at = datetime.now(timezone.utc)
+        self.duration_ms = 0.0
+        self.status: Optional[int] = None
+        self.spans: List[Span] = []
+        self.profile: Optional[Dict[str, Any]] = None
+        self._start = time.perf_counter()
+
+    def open(self, name: str) -> Span:
+        """
+        Start a span below the current one.
+
+        :param name: stage name.
+        :return: span.
+        """
+        parent = _span.get()
+        span = Span(
+            name=name,
+            start_ms=(time.perf_counter() - self._start) * 1000,
+            depth=0 if parent is None else parent.depth + 1,
+        )
+        self.spans.append(span)
+        return span
+
+    def finish(self) -> None:
+        """Record the total duration."""
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Render the trace for the admin endpoint.
+
+        :return: trace as plain data.
+        """
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": self.duration_ms,
+            "spans": [span.as_dict() for span in self.spans],
+            "profile": self.profile,
+        }
+
+
+class TraceStore:
+    """The most recent traces of this worker."""
+
+    def __init__(self, max_traces: int) -> None:
+        self._traces: Deque[Trace] = deque(maxlen=max_traces)
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace) -> None:
+        """
+        Store a finished trace, dropping the oldest one if full.
+
+        :param trace: finished trace.
+        """
+        with self._lock:
+            self._traces.append(trace)
+
+    def slowest(self, limit: int) -> List[Trace]:
+        """
+        Slowest of the stored traces.
+
+        :param limit: max traces returned.
+        :return: traces, slowest first.
+        """
+        with self._lock:
+            traces = list(self._traces)
+        return sorted(traces, key=lambda trace: trace.duration_ms, reverse=True)[:limit]
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        """
+        Find a stored trace.
+
+        :param trace_id: trace id.
+        :return: trace or None if it isn't stored (anymore).
+        """
+        with self._lock:
+            return next((trace for trace in self._traces if trace.id == trace_id), None)
+
+
+@lru_cache(maxsize=None)
+def get_trace_store() -> TraceStore:
+    """
+    Get the store of recent traces.
+
+    :return: trace store.
+    """
+    return TraceStore(settings.trace_buffer_size)
+
+
+def start_span(name: str) -> Optional[Span]:
+    """
+    Open a span if the current request is traced.
+
+    :param name: stage name.
+    :return: the span or None if the request isn't traced.
+    """
+    trace = _trace.get()
+    if trace is None:
+        return None
+    span = trace.open(name)
+    span.token = _span.set(span)
+    return span
+
+
+def end_span(span: Span, elapsed: float) -> None:
+    """
+    Close a span opened by :func:`start_span`.
+
+    :param span: open span.
+    :param elapsed: duration in seconds.
+    """
+    span.duration_ms = elapsed * 1000
+    if span.token is not None:
+        _span.reset(span.token)
+        span.token = None
+
+
+def is_traced() -> bool:
+    """
+    Whether the current request is traced.
+
+    Lets callers skip building span attributes when it isn't.
+
+    :return: True inside a traced request.
+    """
+    return _trace.get() is not None
+
+
+def annotate(**attrs: Any) -> None:
+    """
+    Attach attributes to the innermost open span, if the request is traced.
+
+    :param attrs: attributes.
+    """
+    span = _span.get()
+    if span is not None:
+        span.attrs.update(attrs)
+
+
+class TracingMiddleware:
+    """
+    Traces requests that ask for it or are sampled.
+
+    The trace header is only honored on requests carrying the admin
+    bearer token, since profiling slows down the whole worker; other
+    requests are traced by sampling alone. The header value ``profile``
+    also records a CPU profile; sampled requests get one with
+    ``settings.trace_profile_rate``. Traced responses carry the trace id
+    in the same header.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.header = settings.trace_header.lower().encode("latin-1")
+
+    def _requested_mode(self, scope: Scope) -> Optional[str]:
+        if settings.admin_token is None:
+            return None
+        headers = dict(scope["headers"])
+        value = headers.get(self.header)
+        if value is None:
+            return None
+        expected = f"Bearer {settings.admin_token}".encode()
+        if not secrets.compare_digest(headers.get(b"authorization", b""), expected):
+            return None
+        return "profile" if value == b"profile" else "trace"
+
+    def _mode(self, scope: Scope) -> Optional[str]:
+        requested = self._requested_mode(scope)
+        if requested is not None:
+            return requested
+        rate = settings.trace_sample_rate
+        if rate and random.random() < rate:  # noqa: S311
+            if random.random() < settings.trace_profile_rate:  # noqa: S311
+                return "profile"
+            return "trace"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Run the request, tracing it if enabled.
+
+        :param scope: ASGI scope.
+        :param receive: ASGI receive channel.
+        :param send: ASGI send channel.
+        """
+        mode = None if scope["type"] != "http" else self._mode(scope)
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(scope["method"], scope["path"])
+        token = _trace.set(trace)
+        sampler = None
+        if mode == "profile":
+            sampler = StackSampler(
+                threading.get_ident(),
+                settings.trace_profile_interval_seconds,
+            )
+            sampler.start()
+
+        async def send_with_trace_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                trace.status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = [
+                    *message["headers"],
+                    (self.header, trace.id.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            trace.finish()
+            if sampler is not None:
+                sampler.stop()
+                trace.profile = sampler.report(settings.trace_profile_max_stacks)
+            _trace.reset(token)
+            get_trace_store().add(trace)
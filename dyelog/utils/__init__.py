@@ -0,0 +1,38 @@
+"""Word matching utilities."""
+
+from dyelog.utils.dictionaries import (
+    DictionaryRegistry,
+    get_dictionary_registry,
+    get_incremental_matcher,
+    get_matcher,
+)
+from dyelog.utils.find_pattern import find_pattern
+from dyelog.utils.incremental import (
+    IncrementalMatcher,
+    MatchDelta,
+    MatchHandle,
+    MatchResult,
+)
+from dyelog.utils.matcher import PatternMatcher
+from dyelog.utils.ngram import NgramModel, get_ngram_model
+from dyelog.utils.offload import get_cpu_executor, run_cpu_bound
+from dyelog.utils.ranking import LocalRanker, get_local_ranker
+
+__all__ = [
+    "DictionaryRegistry",
+    "IncrementalMatcher",
+    "LocalRanker",
+    "MatchDelta",
+    "MatchHandle",
+    "MatchResult",
+    "NgramModel",
+    "PatternMatcher",
+    "find_pattern",
+    "get_cpu_executor",
+    "get_dictionary_registry",
+    "get_incremental_matcher",
+    "get_local_ranker",
+    "get_matcher",
+    "get_ngram_model",
+    "run_cpu_bound",
+]
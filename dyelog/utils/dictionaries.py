@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import logging
+import sys
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from dyelog.metrics import record_cache
+from dyelog.settings import settings
+from dyelog.utils.incremental import IncrementalMatcher
+from dyelog.utils.matcher import PatternMatcher
+
+logger = logging.getLogger(__name__)
+
+
+def index_size(matcher: PatternMatcher) -> int:
+    """
+    Approximate memory held by a word index.
+
+    :param matcher: pattern matcher.
+    :return: size in bytes of the words and the lists referencing them.
+    """
+    size = 0
+    for words in matcher.words_by_length.values():
+        size += sys.getsizeof(words) + sum(sys.getsizeof(word) for word in words)
+    return size
+
+
+class DictionaryRegistry:
+    """
+    Word lists by name, indexed on first use.
+
+    Indexes are kept least-recently-used; once their total size exceeds
+    ``memory_budget`` bytes the oldest are dropped and rebuilt on their
+    next use. The most recently used index is always kept, even if it
+    alone is over the budget. The budget covers the word indexes only:
+    the cached prefix states of each :class:`IncrementalMatcher` aren't
+    counted and are bounded separately by ``max_match_words`` references
+    per dictionary.
+    """
+
+    def __init__(
+        self,
+        files: Dict[str, Path],
+        memory_budget: int,
+        max_match_words: int,
+    ) -> None:
+        self.files = files
+        self.memory_budget = memory_budget
+        self.max_match_words = max_match_words
+        self._loaded: OrderedDict[str, Tuple[IncrementalMatcher, int]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.files
+
+    def names(self) -> List[str]:
+        """
+        Names of all registered dictionaries.
+
+        :return: sorted names.
+        """
+        return sorted(self.files)
+
+    def loaded(self) -> List[str]:
+        """
+        Names of the dictionaries currently indexed.
+
+        :return: names, least recently used first.
+        """
+        with self._lock:
+            return list(self._loaded)
+
+    def get_loaded(self, name: str) -> Optional[IncrementalMatcher]:
+        """
+        Get the matcher of a dictionary only if its index is built.
+
+        Checking and getting is a single step, so the index can't be
+        evicted in between and then rebuilt by the caller.
+
+        :param name: dictionary name.
+        :return: incremental matcher or None if :meth:`get` would have
+            to build its index.
+        """
+        matcher = self._lookup(name, record=False)
+        if matcher is not None:
+            record_cache("dictionary", True)
+        return matcher
+
+    def get(self, name: str) -> IncrementalMatcher:
+        """
+        Get the matcher of a dictionary, building its index if needed.
+
+        Concurrent first uses of the same dictionary build it only once.
+
+        :param name: dictionary name.
+        :raises KeyError: if no dictionary has that name.
+        :return: incremental matcher.
+        """
+        if name not in self.files:
+            raise KeyError(name)
+        matcher = self._lookup(name)
+        if matcher is not None:
+            return matcher
+        with self._lock:
+            build_lock = self._build_locks.setdefault(name, threading.Lock())
+        with build_lock:
+            matcher = self._lookup(name, record=False)
+            if matcher is not None:
+                return matcher
+            index = PatternMatcher(file=self.files[name])
+            matcher = IncrementalMatcher(index, max_words=self.max_match_words)
+            self._store(name, matcher, index_size(index))
+        return matcher
+
+    def _lookup(self, name: str, record: bool = True) -> Optional[IncrementalMatcher]:
+        with self._lock:
+            entry = self._loaded.get(name)
+            if entry is not None:
+                self._loaded.move_to_end(name)
+        if record:
+            record_cache("dictionary", entry is not None)
+        return None if entry is None else entry[0]
+
+    def _store(self, name: str, matcher: IncrementalMatcher, size: int) -> None:
+        logger.info("Indexed dictionary %s (%.1f MB)", name, size / 2**20)
+        with self._lock:
+            self._loaded[name] = (matcher, size)
+            self._size += size
+            while self._size > self.memory_budget and len(self._loaded) > 1:
+                evicted, (_, evicted_size) = self._loaded.popitem(last=False)
+                self._size -= evicted_size
+                logger.info("Evicted dictionary %s", evicted)
+
+
+@lru_cache(maxsize=None)
+def get_dictionary_registry() -> DictionaryRegistry:
+    """
+    Get the registry of ``settings.dictionaries``.
+
+    ``settings.words_file`` is registered as ``settings.default_dictionary``.
+
+    :return: dictionary registry.
+    """
+    return DictionaryRegistry(
+        {settings.default_dictionary: settings.words_file, **settings.dictionaries},
+        memory_budget=settings.dictionary_memory_mb * 2**20,
+        max_match_words=settings.match_cache_max_words,
+    )
+
+
+def get_incremental_matcher(dictionary: Optional[str] = None) -> IncrementalMatcher:
+    """
+    Get the shared incremental matcher of a dictionary.
+
+    :param dictionary: dictionary name, ``settings.default_dictionary`` if unset.
+    :raises KeyError: if the dictionary isn't registered.
+    :return: incremental matcher.
+    """
+    return get_dictionary_registry().get(dictionary or settings.default_dictionary)
+
+
+def get_matcher(dictionary: Optional[str] = None) -> PatternMatcher:
+    """
+    Get the shared pattern matcher of a dictionary.
+
+    :param dictionary: dictionary name, ``settings.default_dictionary`` if unset.
+    :raises KeyError: if the dictionary isn't registered.
+    :return: pattern matcher.
+    """
+    return get_incremental_matcher(dictionary).matcher
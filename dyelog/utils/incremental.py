@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
+
+from dyelog.metrics import record_cache
+from dyelog.utils.matcher import PatternMatcher
+
+# Words of every length >= n whose first n letters match the pattern, by length
+PrefixState = Dict[int, List[str]]
+
+
+@dataclass(frozen=True)
+class MatchHandle:
+    """Opaque reference to a previous query."""
+
+    groups: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class MatchDelta:
+    """
+    Change to the pattern of a previous query.
+
+    ``append`` adds ``group`` at the end, ``change`` replaces the last
+    range with ``group`` and ``remove`` drops the last range.
+    """
+
+    op: Literal["append", "change", "remove"]
+    group: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class MatchResult:
+    """Words matching a pattern, plus a handle for follow-up deltas."""
+
+    handle: MatchHandle
+    matches: List[str]
+
+
+class IncrementalMatcher:
+    """
+    Pattern matching that reuses the results of previous queries.
+
+    For every queried pattern prefix the matcher keeps the words of any
+    length whose first letters match it. Appending a range then only
+    filters the parent state on one position instead of rescanning the
+    whole length bucket, and removing or changing the last range goes
+    back to the parent state. States are shared between sessions and
+    evicted least-recently-used once they hold more than ``max_words``
+    word references in total.
+    """
+
+    def __init__(self, matcher: PatternMatcher, max_words: int) -> None:
+        self.matcher = matcher
+        self.max_words = max_words
+        self._states: OrderedDict[Tuple[str, ...], PrefixState] = OrderedDict()
+        self._sizes: Dict[Tuple[str, ...], int] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        # Futures of the prefixes being computed, so each is computed once
+        self._pending: Dict[Tuple[str, ...], "Future[PrefixState]"] = {}
+        self._root_size = sum(len(words) for words in matcher.words_by_length.values())
+
+    def cost(self, groups: Sequence[str]) -> int:
+        """
+        Estimate the work of a query without running it.
+
+        Doesn't take the lock, so it never waits for a query running in
+        another thread; a state evicted concurrently only makes the
+        estimate less precise.
+
+        :param groups: letter ranges, e.g. ``["N-T", "A-F"]``.
+        :return: word references the query would copy or scan: the
+            matches if the pattern is cached, otherwise the words of its
+            longest cached prefix.
+        """
+        key = tuple(group.strip().upper() for group in groups)
+        state = self._states.get(key)
+        if state is not None:
+            return len(state.get(len(key), ()))
+        for length in range(len(key) - 1, 0, -1):
+            size = self._sizes.get(key[:length])
+            if size is not None:
+                return size
+        return self._root_size
+
+    def query(self, groups: Sequence[str]) -> MatchResult:
+        """
+        Find words matching a pattern given as a sequence of ranges.
+
+        :param groups: letter ranges, e.g. ``["N-T", "A-F"]``.
+        :return: matching words of exactly ``len(groups)`` letters.
+        """
+        key = tuple(group.strip().upper() for group in groups)
+        state = self._state(key)
+        matches = list(state.get(len(key), ()))
+        return MatchResult(handle=MatchHandle(key), matches=matches)
+
+    def apply(self, handle: MatchHandle, delta: MatchDelta) -> MatchResult:
+        """
+        Update a previous query with a delta.
+
+        :param handle: handle of the previous query.
+        :param delta: change to its pattern.
+        :return: matches for the updated pattern.
+        """
+        groups = handle.groups
+        if delta.op == "remove":
+            return self.query(groups[:-1])
+        if delta.group is None:
+            raise ValueError(f"Delta {delta.op!r} requires a group")
+        if delta.op == "change":
+            groups = groups[:-1]
+        return self.query((*groups, delta.group))
+
+    def _state(self, key: Tuple[str, ...]) -> PrefixState:
+        """
+        Get the state of a prefix, computing it from its parent if needed.
+
+        The lock only guards the cache itself; states are filtered
+        outside of it, so cheap lookups never wait for a broad one.
+        Concurrent misses of the same prefix compute it once.
+        """
+        if not key:
+            return self.matcher.words_by_length
+        with self._lock:
+            state = self._states.get(key)
+            if state is not None:
+                self._states.move_to_end(key)
+            pending = self._pending.get(key)
+            computing = state is None and pending is None
+            if computing:
+                pending = self._pending[key] = Future()
+        record_cache("match_states", state is not None)
+        if state is not None:
+            return state
+        if not computing and pending is not None:
+            return pending.result()
+
+        try:
+            state = self._filter(self._state(key[:-1]), key)
+        except BaseException as e:
+            with self._lock:
+                future = self._pending.pop(key)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._store(key, state)
+            future = self._pending.pop(key)
+        future.set_result(state)
+        return state
+
+    def _filter(self, parent: PrefixState, key: Tuple[str, ...]) -> PrefixState:
+        position = len(key) - 1
+        char_set = self.matcher.char_sets[key[-1]]
+        state = {}
+        for length, words in parent.items():
+            if length <= position:
+                continue
+            kept = [word for word in words if word[position] in char_set]
+            if kept:
+                state[length] = kept
+        return state
+
+    def _store(self, key: Tuple[str, ...], state: PrefixState) -> None:
+        size = sum(len(words) for words in state.values())
+        self._states[key] = state
+        self._sizes[key] = size
+        self._size += size
+        # Keep the newest state even if it alone exceeds the budget.
+        while self._size > self.max_words and len(self._states) > 1:
+            evicted, _ = self._states.popitem(last=False)
+            self._size -= self._sizes.pop(evicted)
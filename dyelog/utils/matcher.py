@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import logging
 import time
 from collections import defaultdict
 from pathlib import Path
@@ -7,6 +8,8 @@ from typing import List
 
 from dyelog.settings import settings
 
+logger = logging.getLogger(__name__)
+
 
 class PatternMatcher:
     def __init__(self, file: Path | None = None) -> None:
@@ -31,11 +34,11 @@ class PatternMatcher:
         """
         # Store words by length for quick filtering
         self.words_by_length = defaultdict(list)
-        print(f"Preprocessing words from {file}")
         file = settings.words_file.absolute() if file is None else file.absolute()
+        logger.info("Preprocessing words from %s", file)
         # assert file.exists()
 
-        with open(file, "r") as f:  # noqa: PTH123
+        with open(file, "r", encoding="utf-8") as f:  # noqa: PTH123
             for word in f:
                 word = word.strip().upper()  # noqa: PLW2901
                 if min_length is None or len(word) >= min_length:
@@ -70,7 +73,7 @@ class PatternMatcher:
 def main() -> None:
     """Main function for testing."""
     # Initialize matcher
-    file = Path(r"../data/words_alpha.txt")
+    file = Path(r"../../data/words_alpha.txt")
     matcher = PatternMatcher(file=file)
 
     # Example pattern
@@ -0,0 +1,327 @@
+"""
+Next-word prediction with a compiled n-gram model.
+
+The model is compiled offline from a plain text corpus and stored as
+flat integer arrays, so loading it is a few ``array.fromfile`` calls
+and a lookup is a binary search plus a scan over the stored
+continuations::
+
+    python -m dyelog.utils.ngram corpus.txt data/ngram.bin --order 3
+
+For every context of 0 to ``order - 1`` words the table keeps the
+``top`` most frequent next words. Predictions use stupid backoff: the
+longest known context is used first and shorter contexts fill up the
+rest with a score discounted by ``BACKOFF`` per step.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import re
+import sys
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import ujson
+
+from dyelog.settings import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"DYNGRAM1\n"
+BOS = "<s>"
+BACKOFF = 0.4
+TOKEN = re.compile(r"[A-Za-z]+|[.!?]")
+
+
+def tokenize(lines: Iterable[str]) -> Iterator[List[str]]:
+    """
+    Split text into sentences of uppercase words.
+
+    Sentences end at ``.``, ``!``, ``?`` and line breaks.
+
+    :param lines: corpus lines.
+    :yield: words of every non-empty sentence.
+    """
+    for line in lines:
+        sentence: List[str] = []
+        for part in TOKEN.findall(line):
+            if part in ".!?":
+                if sentence:
+                    yield sentence
+                sentence = []
+            else:
+                sentence.append(part.upper())
+        if sentence:
+            yield sentence
+
+
+@dataclass
+class NgramTable:
+    """
+    Continuations of all contexts of one length.
+
+    ``keys`` are the sorted context keys; the continuations of
+    ``keys[i]`` are ``next_ids[offsets[i]:offsets[i + 1]]`` with their
+    ``counts``, most frequent first, and ``totals[i]`` is the number of
+    times the context was seen.
+    """
+
+    keys: "array[int]"
+    offsets: "array[int]"
+    totals: "array[int]"
+    next_ids: "array[int]"
+    counts: "array[int]"
+
+    def arrays(self) -> List["array[int]"]:
+        """Arrays in the order they are stored in."""
+        return [self.keys, self.offsets, self.totals, self.next_ids, self.counts]
+
+    def find(self, key: int) -> int:
+        """
+        Index of a context key.
+
+        :param key: context key.
+        :return: index into ``keys`` or -1 if the context is unknown.
+        """
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return index
+        return -1
+
+
+class NgramModel:
+    """In-process n-gram next-word model."""
+
+    def __init__(self, order: int, vocab: List[str], tables: List[NgramTable]) -> None:
+        self.order = order
+        self.vocab = vocab
+        self.tables = tables
+        self.ids = {word: index for index, word in enumerate(vocab)}
+
+    def context_key(self, context: List[int]) -> int:
+        """
+        Encode a context of word ids as a single integer.
+
+        :param context: word ids, oldest first.
+        :return: key.
+        """
+        key = 0
+        for word_id in context:
+            key = key * len(self.vocab) + word_id
+        return key
+
+    def predict(
+        self,
+        words: List[str],
+        limit: int,
+        allowed: Optional[Callable[[str], bool]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Most likely next words.
+
+        :param words: words so far; only the last ``order - 1`` are used.
+        :param limit: max words returned.
+        :param allowed: only words it returns True for are predicted.
+        :return: (word, score) pairs, best first; scores are in 0..1.
+        """
+        history = [self.ids[BOS]] + [self.ids.get(word.upper(), -1) for word in words]
+        scores: Dict[int, float] = {}
+        weight = 1.0
+        for length in range(min(self.order - 1, len(history)), -1, -1):
+            context = history[len(history) - length :]
+            if -1 not in context:
+                self._collect(length, context, weight, scores, allowed)
+                if len(scores) >= limit:
+                    break
+            weight *= BACKOFF
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(self.vocab[word_id], score) for word_id, score in ranked[:limit]]
+
+    def _collect(
+        self,
+        length: int,
+        context: List[int],
+        weight: float,
+        scores: Dict[int, float],
+        allowed: Optional[Callable[[str], bool]],
+    ) -> None:
+        table = self.tables[length]
+        index = table.find(self.context_key(context))
+        if index < 0:
+            return
+        total = table.totals[index]
+        for position in range(table.offsets[index], table.offsets[index + 1]):
+            word_id = table.next_ids[position]
+            if word_id in scores:
+                continue
+            if allowed is not None and not allowed(self.vocab[word_id]):
+                continue
+            scores[word_id] = weight * table.counts[position] / total
+
+    def save(self, path: Path) -> None:
+        """
+        Write the model in its binary format.
+
+        :param path: output file.
+        """
+        header = {
+            "order": self.order,
+            "vocab": self.vocab,
+            "tables": [[len(table.keys), len(table.next_ids)] for table in self.tables],
+        }
+        with path.open("wb") as f:
+            f.write(MAGIC)
+            f.write(ujson.dumps(header).encode() + b"\n")
+            for table in self.tables:
+                for values in table.arrays():
+                    if sys.byteorder == "big":
+                        values = array(values.typecode, values)  # noqa: PLW2901
+                        values.byteswap()
+                    values.tofile(f)
+
+    @classmethod
+    def load(cls, path: Path) -> NgramModel:
+        """
+        Read a model written by :meth:`save`.
+
+        :param path: model file.
+        :raises ValueError: if the file isn't an n-gram model.
+        :return: model.
+        """
+        with path.open("rb") as f:
+            if f.readline() != MAGIC:
+                raise ValueError(f"{path} is not an n-gram model")
+            header = ujson.loads(f.readline())
+            tables = []
+            for keys, entries in header["tables"]:
+                sizes = [("q", keys), ("q", keys + 1), ("q", keys)]
+                sizes += [("i", entries), ("i", entries)]
+                arrays = []
+                for typecode, size in sizes:
+                    values = array(typecode)
+                    values.fromfile(f, size)
+                    if sys.byteorder == "big":
+                        values.byteswap()
+                    arrays.append(values)
+                tables.append(NgramTable(*arrays))
+        return cls(header["order"], header["vocab"], tables)
+
+
+def compile_model(
+    sentences: Iterable[List[str]],
+    order: int = 3,
+    top: int = 64,
+    min_count: int = 2,
+    max_vocab: int = 100_000,
+) -> NgramModel:
+    """
+    Count n-grams and build the array tables.
+
+    :param sentences: tokenized sentences.
+    :param order: longest n-gram, including the predicted word.
+    :param top: continuations kept per context; all are kept without context.
+    :param min_count: words seen less often are left out.
+    :param max_vocab: max words in the vocabulary.
+    :raises ValueError: if context keys wouldn't fit in 64 bits.
+    :return: model.
+    """
+    sentences = list(sentences)
+    frequency = Counter(word for sentence in sentences for word in sentence)
+    common = [word for word, count in frequency.items() if count >= min_count]
+    common.sort(key=lambda word: (-frequency[word], word))
+    vocab = [BOS, *common[:max_vocab]]
+    if len(vocab) ** (order - 1) >= 2**63:
+        raise ValueError(f"Vocabulary too large for order {order}")
+    model = NgramModel(order, vocab, [])
+
+    counts: List[Dict[int, Counter[int]]] = [defaultdict(Counter) for _ in range(order)]
+    for sentence in sentences:
+        history = [0] + [model.ids.get(word, -1) for word in sentence]
+        for position in range(1, len(history)):
+            if history[position] < 0:
+                continue
+            for length in range(min(order - 1, position) + 1):
+                context = history[position - length : position]
+                if -1 in context:
+                    break
+                counts[length][model.context_key(context)][history[position]] += 1
+
+    for length, contexts in enumerate(counts):
+        table = NgramTable(
+            array("q"),
+            array("q", [0]),
+            array("q"),
+            array("i"),
+            array("i"),
+        )
+        for key in sorted(contexts):
+            continuations = contexts[key]
+            table.keys.append(key)
+            table.totals.append(sum(continuations.values()))
+            kept = sorted(continuations.items(), key=lambda item: (-item[1], item[0]))
+            for word_id, count in kept if length == 0 else kept[:top]:
+                table.next_ids.append(word_id)
+                table.counts.append(count)
+            table.offsets.append(len(table.next_ids))
+        model.tables.append(table)
+    return model
+
+
+@lru_cache(maxsize=None)
+def get_ngram_model() -> Optional[NgramModel]:
+    """
+    Get the model configured by ``settings.ngram_file``.
+
+    :return: n-gram model or None if none is configured.
+    """
+    if settings.ngram_file is None:
+        return None
+    model = NgramModel.load(settings.ngram_file)
+    logger.info("Loaded %d-gram model with %d words", model.order, len(model.vocab))
+    return model
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Compile a corpus into a model file.
+
+    :param argv: command line arguments.
+    :return: exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("corpus", type=Path, help="plain text corpus")
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--order", type=int, default=3)
+    parser.add_argument("--top", type=int, default=64)
+    parser.add_argument("--min-count", type=int, default=2)
+    parser.add_argument("--max-vocab", type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    with args.corpus.open() as f:
+        model = compile_model(
+            tokenize(f),
+            order=args.order,
+            top=args.top,
+            min_count=args.min_count,
+            max_vocab=args.max_vocab,
+        )
+    model.save(args.output)
+    logger.info(
+        "Wrote %d-gram model with %d words to %s",
+        model.order,
+        len(model.vocab),
+        args.output,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
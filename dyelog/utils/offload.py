@@ -0,0 +1,63 @@
+"""
+CPU-bound work off the event loop.
+
+Matching a broad pattern or ranking tens of thousands of words takes
+long enough to stall every other request of a worker. Such work runs in
+a small thread pool instead; the threads share the read-only indexes
+of the process, so nothing is copied. Work estimated below
+``settings.cpu_offload_min_words`` runs inline, where the hand-off
+would cost more than it saves.
+"""
+
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Any, Callable, TypeVar
+
+from dyelog.metrics import CPU_TASKS
+from dyelog.settings import settings
+
+T = TypeVar("T")
+
+
+@lru_cache(maxsize=None)
+def get_cpu_executor() -> ThreadPoolExecutor:
+    """
+    Get the pool CPU-bound work is offloaded to.
+
+    :return: thread pool of ``settings.cpu_pool_workers`` threads.
+    """
+    return ThreadPoolExecutor(
+        max_workers=settings.cpu_pool_workers,
+        thread_name_prefix="dyelog-cpu",
+    )
+
+
+async def run_cpu_bound(
+    task: str,
+    cost: int,
+    func: Callable[..., T],
+    *args: Any,
+) -> T:
+    """
+    Run a function inline or in the CPU pool, depending on its cost.
+
+    The function runs in a copy of the caller's context, so metrics
+    stages and trace spans inside it are recorded as usual.
+
+    :param task: task name for metrics.
+    :param cost: estimated work in word references.
+    :param func: function to run.
+    :param args: its arguments.
+    :return: its result.
+    """
+    if cost < settings.cpu_offload_min_words:
+        CPU_TASKS.labels(task, "inline").inc()
+        return func(*args)
+    CPU_TASKS.labels(task, "pool").inc()
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        get_cpu_executor(),
+        partial(context.run, func, *args),
+    )
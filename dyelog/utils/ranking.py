@@ -0,0 +1,56 @@
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from dyelog.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LocalRanker:
+    """
+    Deterministic word ranking that doesn't need the LLM.
+
+    Words are ordered by their position in a frequency-ordered word list;
+    words not on the list follow in alphabetical order. Used when the LLM
+    is unavailable or the request ran out of time.
+    """
+
+    def __init__(self, frequency_file: Path) -> None:
+        self.ranks: Dict[str, int] = {}
+        try:
+            with frequency_file.open() as f:
+                for word in f.read().split():
+                    self.ranks.setdefault(word.upper(), len(self.ranks))
+        except OSError as e:
+            logger.warning(f"Frequency list not loaded, ranking alphabetically: {e}")
+
+    def rank(self, words: List[str]) -> List[Tuple[str, float]]:
+        """
+        Rank words by frequency.
+
+        Confidence falls linearly with the position in the result.
+
+        :param words: words to rank.
+        :return: (word, confidence) tuples, best first.
+        """
+        unknown = len(self.ranks)
+        ordered = sorted(words, key=lambda word: (self.ranks.get(word, unknown), word))
+        total = len(ordered)
+        return [
+            (word, round(100.0 * (total - position) / total, 1))
+            for position, word in enumerate(ordered)
+        ]
+
+
+@lru_cache(maxsize=None)
+def get_local_ranker() -> LocalRanker:
+    """
+    Get the local ranker.
+
+    The frequency list is loaded on first use.
+
+    :return: local ranker.
+    """
+    return LocalRanker(settings.frequency_file)
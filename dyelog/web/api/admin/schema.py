@@ -0,0 +1,37 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+
+class SpanResponse(BaseModel):
+    """A timed stage of a traced request."""
+
+    name: str
+    # Offset from the start of the request
+    start_ms: float
+    # None if the stage hadn't finished when the request did
+    duration_ms: Optional[float]
+    depth: int
+    attrs: Dict[str, Any]
+
+
+class ProfileResponse(BaseModel):
+    """Sampled stacks of the event loop thread during the request."""
+
+    interval_ms: float
+    samples: int
+    # Collapsed stacks ("outer;inner") with their sample counts
+    stacks: List[Tuple[str, int]]
+
+
+class TraceResponse(BaseModel):
+    """Trace of a single request."""
+
+    id: str
+    method: str
+    path: str
+    status: Optional[int]
+    started_at: str
+    duration_ms: float
+    spans: List[SpanResponse]
+    profile: Optional[ProfileResponse]
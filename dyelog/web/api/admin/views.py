@@ -0,0 +1,55 @@
+import secrets
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+
+from dyelog.settings import settings
+from dyelog.tracing import TraceStore, get_trace_store
+from dyelog.web.api.admin.schema import TraceResponse
+
+router = APIRouter()
+
+
+def require_admin(authorization: Optional[str] = Header(None)) -> None:
+    """
+    Check the admin bearer token.
+
+    Admin endpoints don't exist unless ``settings.admin_token`` is set.
+
+    :param authorization: Authorization header.
+    :raises HTTPException: if the token is missing or wrong.
+    """
+    if settings.admin_token is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    expected = f"Bearer {settings.admin_token}"
+    if authorization is None or not secrets.compare_digest(authorization, expected):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@router.get(
+    "/traces",
+    response_model=List[TraceResponse],
+    dependencies=[Depends(require_admin)],
+)
+def slowest_traces(
+    limit: int = Query(10, ge=1, le=100),
+    store: TraceStore = Depends(get_trace_store),
+) -> List[TraceResponse]:
+    """Slowest of the recent traces of this worker, slowest first."""
+    return [TraceResponse(**trace.as_dict()) for trace in store.slowest(limit)]
+
+
+@router.get(
+    "/traces/{trace_id}",
+    response_model=TraceResponse,
+    dependencies=[Depends(require_admin)],
+)
+def get_trace(
+    trace_id: str,
+    store: TraceStore = Depends(get_trace_store),
+) -> TraceResponse:
+    """A single recent trace, by the id from the trace response header."""
+    trace = store.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace expired or unknown")
+    return TraceResponse(**trace.as_dict())
@@ -0,0 +1,188 @@
+"""
+Cursor paging of ranked prompt options.
+
+The ranking behind a cursor is kept in a SQLite database in WAL mode,
+so a cursor handed out by one uvicorn worker can be paged through on
+any other worker of the host.
+"""
+
+import logging
+import secrets
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import ujson
+
+from dyelog.metrics import record_cache
+from dyelog.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ranked_lists (
+    key TEXT PRIMARY KEY,
+    ranked TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ranked_lists_expires_at ON ranked_lists (expires_at);
+"""
+
+
+def prompt_options(
+    ranked: List[Tuple[str, float]],
+    start: int,
+    stop: int,
+) -> List[Dict[str, Any]]:
+    """
+    Render a slice of the ranked words as prompt options.
+
+    Plain dicts are used instead of ``PromptOption`` models because this
+    runs on every keystroke. ``id`` is the rank in the full list.
+    """
+    return [
+        {"id": rank, "prompt": word, "confidence": score}
+        for rank, (word, score) in enumerate(ranked[start:stop], start)
+    ]
+
+
+class RankedListStore:
+    """
+    Short-lived storage of ranked word lists, shared by all workers.
+
+    Keeps the tail of a ranking so clients can page through it with
+    an opaque cursor. Entries expire after ``ttl`` seconds and the oldest
+    are evicted beyond ``max_entries`` every ``evict_every`` writes. As
+    in :class:`dyelog.services.llm.LLMCache`, every thread uses its own
+    connection and writes only wait briefly for other workers: a ranking
+    that can't be stored gets no cursor instead of stalling the response.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ttl: float,
+        max_entries: int,
+        evict_every: int = 100,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection: Optional[sqlite3.Connection] = getattr(
+            self._local,
+            "connection",
+            None,
+        )
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path,
+                timeout=0.1,
+                isolation_level=None,
+            )
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def cursor(self, ranked: List[Tuple[str, float]], offset: int) -> Optional[str]:
+        """
+        Store a ranking and get a cursor pointing at ``offset``.
+
+        :param ranked: (word, confidence) pairs, best first.
+        :param offset: rank of the first option on the next page.
+        :return: cursor or None if nothing is left after ``offset``
+            or the ranking couldn't be stored.
+        """
+        if offset >= len(ranked):
+            return None
+        key = secrets.token_urlsafe(12)
+        try:
+            self._connection().execute(
+                "INSERT INTO ranked_lists VALUES (?, ?, ?)",
+                (key, ujson.dumps(ranked), time.time() + self.ttl),
+            )
+            with self._lock:
+                self._writes += 1
+                evict = self._writes % self.evict_every == 0
+            if evict:
+                self.evict()
+        except sqlite3.Error:
+            logger.warning("Storing a ranked list failed", exc_info=True)
+            return None
+        return f"{key}.{offset}"
+
+    def page(
+        self,
+        cursor: str,
+        limit: int,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Get the page a cursor points at.
+
+        :param cursor: cursor returned by a previous call.
+        :param limit: max options on the page.
+        :raises KeyError: if the cursor is invalid or expired.
+        :return: prompt options and the cursor of the following page.
+        """
+        key, _, raw_offset = cursor.rpartition(".")
+        if not raw_offset.isdigit():
+            raise KeyError(cursor)
+        offset = int(raw_offset)
+        try:
+            row = (
+                self._connection()
+                .execute(
+                    "SELECT ranked FROM ranked_lists WHERE key = ? AND expires_at > ?",
+                    (key, time.time()),
+                )
+                .fetchone()
+            )
+        except sqlite3.Error:
+            logger.warning("Ranked list lookup failed", exc_info=True)
+            row = None
+        record_cache("prompt_cursor", row is not None)
+        if row is None:
+            raise KeyError(cursor)
+        ranked = ujson.loads(row[0])
+        stop = offset + limit
+        next_cursor = f"{key}.{stop}" if stop < len(ranked) else None
+        return prompt_options(ranked, offset, stop), next_cursor
+
+    def evict(self) -> None:
+        """Drop expired rankings and the oldest ones beyond ``max_entries``."""
+        connection = self._connection()
+        connection.execute(
+            "DELETE FROM ranked_lists WHERE expires_at <= ?",
+            (time.time(),),
+        )
+        connection.execute(
+            "DELETE FROM ranked_lists WHERE key IN ("
+            "SELECT key FROM ranked_lists ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+
+@lru_cache(maxsize=None)
+def get_ranked_list_store() -> RankedListStore:
+    """
+    Get the store behind prompt option cursors.
+
+    :return: ranked list store in ``settings.prompt_cursor_file``.
+    """
+    return RankedListStore(
+        settings.prompt_cursor_file,
+        ttl=settings.prompt_cursor_ttl_seconds,
+        max_entries=settings.prompt_cursor_max_entries,
+    )
@@ -0,0 +1,190 @@
+"""
+Precomputed predictions for common caregiver questions.
+
+Tables are built offline with ``python -m dyelog.precompute`` and map a
+normalized context and group pattern to the scored words and sentences
+the LLM produced for them. A table is tied to the dictionary and the
+models and options of the LLM tasks it was built with; a table built
+for anything else is rejected on load.
+"""
+
+import gzip
+import hashlib
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import ujson
+
+from dyelog.services.llm import get_task_model
+from dyelog.settings import ModelConfig, settings
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+# LLM tasks whose replies are stored in tables.
+TASKS = ("score_words", "generate_sentences")
+
+
+class StalePrecomputedTableError(Exception):
+    """The table was built for another dictionary, models or format."""
+
+
+def table_version(words_file: Path, models: Dict[str, ModelConfig]) -> Dict[str, Any]:
+    """
+    Version stamp of tables built from a dictionary and models.
+
+    :param words_file: dictionary the patterns were matched against.
+    :param models: model and options of every task in :data:`TASKS`, by task.
+    :return: version stamp.
+    """
+    digest = hashlib.sha256(words_file.read_bytes()).hexdigest()
+    return {
+        "format": FORMAT_VERSION,
+        "dictionary": digest[:16],
+        "models": {
+            task: model.model_dump(exclude_none=True) for task, model in models.items()
+        },
+    }
+
+
+def current_table_version() -> Dict[str, Any]:
+    """
+    Version stamp of tables built with the current settings.
+
+    :return: version stamp.
+    """
+    return table_version(
+        settings.words_file,
+        {task: get_task_model(task) for task in TASKS},
+    )
+
+
+def normalize_context(context: str) -> str:
+    """
+    Normalize a context for lookups.
+
+    :param context: conversational context.
+    :return: lowercase context with collapsed whitespace.
+    """
+    return " ".join(context.casefold().split())
+
+
+def normalize_pattern(letter_ranges: str) -> str:
+    """
+    Normalize letter ranges for lookups.
+
+    :param letter_ranges: letter ranges, e.g. "n-t a-f".
+    :return: uppercase ranges separated by single spaces.
+    """
+    return " ".join(letter_ranges.upper().split())
+
+
+class PrecomputedTable:
+    """Scored words and sentences by context and group pattern."""
+
+    def __init__(self, version: Dict[str, Any]) -> None:
+        self.version = version
+        self.entries: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # Why the configured table isn't used, if it isn't
+        self.error: Optional[str] = None
+
+    def __len__(self) -> int:
+        return sum(len(patterns) for patterns in self.entries.values())
+
+    def add(
+        self,
+        context: str,
+        letter_ranges: str,
+        scored_words: List[Tuple[str, float]],
+        sentences: List[str],
+    ) -> None:
+        """
+        Store the predictions for a context and pattern.
+
+        :param context: conversational context.
+        :param letter_ranges: letter ranges.
+        :param scored_words: (word, confidence) pairs, best first.
+        :param sentences: sentences for the best word.
+        """
+        patterns = self.entries.setdefault(normalize_context(context), {})
+        patterns[normalize_pattern(letter_ranges)] = {
+            "words": [[word, score] for word, score in scored_words],
+            "sentences": sentences,
+        }
+
+    def lookup(
+        self,
+        context: str,
+        letter_ranges: str,
+    ) -> Optional[Tuple[List[Tuple[str, float]], List[str]]]:
+        """
+        Find the predictions for a context and pattern.
+
+        :param context: conversational context.
+        :param letter_ranges: letter ranges.
+        :return: scored words and sentences or None if not precomputed.
+        """
+        patterns = self.entries.get(normalize_context(context))
+        if patterns is None:
+            return None
+        entry = patterns.get(normalize_pattern(letter_ranges))
+        if entry is None:
+            return None
+        return [(pair[0], pair[1]) for pair in entry["words"]], entry["sentences"]
+
+    def save(self, path: Path) -> None:
+        """
+        Write the table as gzipped JSON.
+
+        :param path: output file.
+        """
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            ujson.dump({"version": self.version, "entries": self.entries}, f)
+
+    @classmethod
+    def load(cls, path: Path, expected_version: Dict[str, Any]) -> "PrecomputedTable":
+        """
+        Read a table written by :meth:`save`.
+
+        :param path: table file.
+        :param expected_version: version stamp of the running dictionary and models.
+        :raises StalePrecomputedTableError: if the table has another version.
+        :return: table.
+        """
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = ujson.load(f)
+        if data.get("version") != expected_version:
+            raise StalePrecomputedTableError(
+                f"Precomputed table {path} was built for {data.get('version')}, "
+                f"expected {expected_version}",
+            )
+        table = cls(expected_version)
+        table.entries = data["entries"]
+        return table
+
+
+@lru_cache(maxsize=None)
+def get_precomputed_table() -> PrecomputedTable:
+    """
+    Get the precomputed table configured by ``settings.precomputed_file``.
+
+    A missing, unreadable or stale table is logged and replaced by an
+    empty one, so predictions fall back to the LLM.
+
+    :return: precomputed table.
+    """
+    path = settings.precomputed_file
+    if path is None:
+        return PrecomputedTable({})
+    version = current_table_version()
+    try:
+        table = PrecomputedTable.load(path, version)
+    except (OSError, ValueError, KeyError, StalePrecomputedTableError) as e:
+        logger.warning(f"Precomputed table not used: {e}")
+        table = PrecomputedTable(version)
+        table.error = str(e)
+        return table
+    logger.info("Loaded %d precomputed predictions from %s", len(table), path)
+    return table
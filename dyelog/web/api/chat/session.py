@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException, WebSocket
+from pydantic import BaseModel, Field
+
+from dyelog.metrics import SESSION_PREDICTIONS
+
+logger = logging.getLogger(__name__)
+
+
+class SessionUpdate(BaseModel):
+    """
+    Change to the state of a keyboard session.
+
+    Fields are applied in declaration order and any of them may be omitted.
+    """
+
+    letter_ranges: Optional[str] = Field(
+        None,
+        description="Replace all letter ranges, e.g. 'N-T G-M'.",
+    )
+    remove_last_range: bool = Field(
+        False,
+        description="Drop the last letter range.",
+    )
+    append_range: Optional[str] = Field(
+        None,
+        description="Add a letter range at the end, e.g. 'U-Z'.",
+    )
+    context: Optional[str] = Field(
+        None,
+        description="Replace the conversational context.",
+    )
+
+
+class PredictionSession:
+    """
+    State of a single keyboard session.
+
+    Every update bumps ``version`` and reschedules the prediction.
+    A prediction waits ``debounce`` seconds before it starts and is
+    cancelled as soon as a newer update arrives, so work for stale
+    state is dropped instead of competing for the LLM.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        predict: Callable[[str, str], Awaitable[Dict[str, Any]]],
+        debounce: float,
+    ) -> None:
+        self.websocket = websocket
+        self.predict = predict
+        self.debounce = debounce
+        self.letter_ranges: List[str] = []
+        self.context = ""
+        self.version = 0
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def apply(self, update: SessionUpdate) -> None:
+        """
+        Apply an update and schedule predictions for the new state.
+
+        :param update: change sent by the client.
+        """
+        if update.letter_ranges is not None:
+            self.letter_ranges = update.letter_ranges.upper().split()
+        if update.remove_last_range and self.letter_ranges:
+            self.letter_ranges.pop()
+        if update.append_range is not None:
+            self.letter_ranges.append(update.append_range.strip().upper())
+        if update.context is not None:
+            self.context = update.context
+        self.version += 1
+        self._cancel()
+        self._task = asyncio.create_task(
+            self._run(self.version, " ".join(self.letter_ranges), self.context),
+        )
+
+    def _cancel(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    async def _run(self, version: int, letter_ranges: str, context: str) -> None:
+        started = False
+        try:
+            await asyncio.sleep(self.debounce)
+            started = True
+            if letter_ranges:
+                result = await self.predict(letter_ranges, context)
+            else:
+                result = {
+                    "prompt_options": [],
+                    "sentences": [],
+                    "next_cursor": None,
+                    "degraded": False,
+                    "degraded_reason": None,
+                }
+        except asyncio.CancelledError:
+            SESSION_PREDICTIONS.labels("cancelled" if started else "debounced").inc()
+            raise
+        except HTTPException as e:
+            SESSION_PREDICTIONS.labels("error").inc()
+            await self.websocket.send_json({"version": version, "error": e.detail})
+            return
+        SESSION_PREDICTIONS.labels("sent").inc()
+        await self.websocket.send_json({"version": version, **result})
+
+    async def close(self) -> None:
+        """Cancel outstanding work once the client has gone."""
+        self._cancel()
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
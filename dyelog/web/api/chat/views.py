@@ -1,23 +1,39 @@
+import asyncio
 import logging
 import string
-from typing import ClassVar, List, Optional, Tuple
-
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
-
+import sys
+from functools import partial
+from typing import Any, ClassVar, Dict, Iterable, List, Optional, Tuple, Union
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import UJSONResponse
+from pydantic import BaseModel, Field, ValidationError
+
+from dyelog.metrics import (
+    CANDIDATE_WORDS,
+    FALLBACK_SCORES,
+    LLM_REQUESTS,
+    observe_llm_response,
+    observe_stage,
+    record_cache,
+)
+from dyelog.services.llm import Deadline, LLMUnavailableError, chat
 from dyelog.settings import settings
-from dyelog.utils import PatternMatcher
-from ollama import AsyncClient
+from dyelog.utils import (
+    IncrementalMatcher,
+    get_dictionary_registry,
+    get_incremental_matcher,
+    get_local_ranker,
+    get_ngram_model,
+    run_cpu_bound,
+)
+from dyelog.web.api.chat.pagination import get_ranked_list_store, prompt_options
+from dyelog.web.api.chat.precomputed import get_precomputed_table
+from dyelog.web.api.chat.session import PredictionSession, SessionUpdate
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-MODEL = settings.ollama_model
-
-matcher = PatternMatcher()
-
 
 # Models
 class ChatInput(BaseModel):
@@ -34,6 +50,23 @@ class ChatInput(BaseModel):
         description="The conversational context or question being answered",
         example="What would you like to eat?",
     )
+    top_k: Optional[int] = Field(
+        None,
+        ge=1,
+        le=100,
+        description="Number of prompt options to return, settings.predict_top_k if unset",
+    )
+    budget_seconds: Optional[float] = Field(
+        None,
+        gt=0,
+        le=60,
+        description="Latency budget, settings.predict_budget_seconds if unset. "
+        "Past it, words are ranked locally and no sentences are generated.",
+    )
+    dictionary: Optional[str] = Field(
+        None,
+        description="Dictionary to match against, settings.default_dictionary if unset",
+    )
 
     class Config:
         json_schema_extra = {
@@ -57,6 +90,12 @@ class ChatResponse(BaseModel):
 
     prompt_options: List[PromptOption]
     sentences: List[str]
+    # Cursor for the next page of prompt options, if there are more
+    next_cursor: Optional[str] = None
+    # Set when the LLM couldn't answer in time and words were ranked locally
+    degraded: bool = False
+    # circuit_open, budget_exhausted or error
+    degraded_reason: Optional[str] = None
 
     class Config:
         json_schema_extra: ClassVar = {
@@ -72,10 +111,70 @@ class ChatResponse(BaseModel):
                     "Pizza sounds perfect right now.",
                     "I'm craving a hot pizza with extra cheese.",
                 ],
+                "next_cursor": "Jw8Ld0vVQ6yJ2Kxa.3",
+                "degraded": False,
+                "degraded_reason": None,
             },
         }
 
 
+class BatchChatInput(BaseModel):
+    """Input model for batch predictions."""
+
+    items: List[ChatInput] = Field(..., min_length=1)
+
+
+class BatchChatItem(BaseModel):
+    """Result of a single batch item; exactly one of the fields is set."""
+
+    result: Optional[ChatResponse] = None
+    error: Optional[str] = None
+
+
+class BatchChatResponse(BaseModel):
+    """Batch results in the order of the input items."""
+
+    results: List[BatchChatItem]
+
+
+class DictionariesResponse(BaseModel):
+    """Registered dictionaries."""
+
+    default: str
+    dictionaries: List[str]
+    # Dictionaries whose index is currently in memory
+    loaded: List[str]
+
+
+class NextWordInput(BaseModel):
+    """Input model for next-word predictions."""
+
+    words: List[str] = Field(
+        default_factory=list,
+        description="Words of the sentence so far",
+        examples=[["I", "WOULD", "LIKE"]],
+    )
+    letter_ranges: Optional[str] = Field(
+        None,
+        description="Only predict words whose first letters are in these ranges",
+        examples=["N-T"],
+    )
+    limit: int = Field(4, ge=1, le=100)
+
+
+class NextWordResponse(BaseModel):
+    """Likely next words; confidence is the model's score in percent."""
+
+    prompt_options: List[PromptOption]
+
+
+class PromptOptionsPage(BaseModel):
+    """A page of prompt options."""
+
+    prompt_options: List[PromptOption]
+    next_cursor: Optional[str] = None
+
+
 class WordSelector(BaseModel):
     """Model for word selection."""
 
@@ -83,11 +182,6 @@ class WordSelector(BaseModel):
     context: str = Field(..., example="What would you like to eat?")  # type: ignore
 
 
-# Initialize FastAPI and Ollama client
-
-client = AsyncClient(host=settings.ollama_host)
-
-
 def parse_letter_ranges(ranges_str: str) -> List[set[str]]:
     """
     Parse letter ranges string into sets of allowed letters.
@@ -119,11 +213,16 @@ def parse_letter_ranges(ranges_str: str) -> List[set[str]]:
     return letter_sets
 
 
-async def score_words(words: List[str], context: str) -> List[Tuple[str, float]]:
+async def score_words(
+    words: List[str],
+    context: str,
+    deadline: Optional[Deadline] = None,
+) -> List[Tuple[str, float]]:
     """
-    Score words based on their relevance to the context using llama3.2.
+    Score words based on their relevance to the context using the LLM.
 
-    Returns list of (word, confidence) tuples.
+    Returns list of (word, confidence) tuples. Raises ``LLMUnavailableError``
+    if the LLM can't answer before the deadline.
     """
     if not words:
         return []
@@ -147,60 +246,140 @@ PASTA:72.3
 Only return the word:score pairs, one per line. Nothing else."""
 
     try:
-        response = await client.chat(
-            model=MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            stream=False,
-        )
+        with observe_stage("score_words"):
+            response = await chat(prompt, deadline, "score_words")
+    except LLMUnavailableError as e:
+        logger.error(f"Error scoring words: {e.reason}")
+        LLM_REQUESTS.labels("score_words", e.reason).inc()
+        raise
+    observe_llm_response("score_words", response)
+
+    with observe_stage("parse_scores"):
+        return parse_scores(response["message"]["content"])
+
+
+def parse_scores(content: str) -> List[Tuple[str, float]]:
+    """Parse ``WORD:SCORE`` lines of a scoring reply, best first."""
+    scored_words = []
+    for line in content.split("\n"):
+        if ":" in line:
+            word, score_str = line.strip().rsplit(":", 1)
+            try:
+                score = float(score_str)
+                if score >= 30.0:  # Only include words with confidence >= 30%
+                    scored_words.append((word.strip(), score))
+            except ValueError:
+                continue
+
+    return sorted(scored_words, key=lambda x: x[1], reverse=True)
+
+
+def parse_sentences(content: str) -> List[str]:
+    """Parse the sentence lines of a sentence generation reply."""
+    return [
+        sent.strip()
+        for sent in content.split("\n")
+        if sent.strip() and not sent.startswith("-")  # Filter out any bullet points
+    ]
+
+
+def _find_matches(
+    groups: List[str],
+    dictionary: Optional[str],
+    matcher: Optional[IncrementalMatcher],
+) -> List[str]:
+    with observe_stage("find_matches"):
+        if matcher is None:
+            matcher = get_incremental_matcher(dictionary)
+        return matcher.query(groups).matches
+
+
+async def match_words(
+    letter_ranges: str,
+    dictionary: Optional[str] = None,
+) -> List[str]:
+    """
+    Find the dictionary words matching the letter pattern using PatternMatcher.
 
-        scored_words = []
-        for line in response["message"]["content"].split("\n"):
-            if ":" in line:
-                word, score_str = line.strip().split(":")
-                try:
-                    score = float(score_str)
-                    if score >= 30.0:  # Only include words with confidence >= 30%
-                        scored_words.append((word.strip(), score))
-                except ValueError:
-                    continue
-
-        return sorted(scored_words, key=lambda x: x[1], reverse=True)
-    except Exception as e:
-        logger.error(f"Error scoring words: {e}")
-        return [(word, 60.0) for word in words]  # Fallback scoring
+    Broad patterns, and dictionaries that still have to be indexed, are
+    matched in the CPU pool so they don't block the event loop.
+    """
+    # Convert letter ranges to pattern format
+    pattern = letter_ranges.upper()
+    groups = pattern.split()
+
+    matcher = get_dictionary_registry().get_loaded(
+        dictionary or settings.default_dictionary,
+    )
+    cost = sys.maxsize if matcher is None else matcher.cost(groups)
+    matching_words = await run_cpu_bound(
+        "match_words",
+        cost,
+        _find_matches,
+        groups,
+        dictionary,
+        matcher,
+    )
+    CANDIDATE_WORDS.observe(len(matching_words))
+    logger.debug(
+        "Found %d matching words",
+        len(matching_words),
+        extra={"fields": {"pattern": pattern, "matching_words": matching_words}},
+    )
+    return matching_words
 
 
 async def generate_words(
     context: str,
     letter_ranges: str,
     min_length: Optional[int] = None,
-) -> List[Tuple[str, float]]:
-    """Generate and score words matching the letter pattern using PatternMatcher and llama3.2."""
-    try:
-        # Initialize PatternMatcher
-
-        # Convert letter ranges to pattern format
-        pattern = letter_ranges.upper()
+    deadline: Optional[Deadline] = None,
+    matching_words: Optional[List[str]] = None,
+    dictionary: Optional[str] = None,
+) -> Tuple[List[Tuple[str, float]], Optional[str]]:
+    """
+    Generate and score words matching the letter pattern using PatternMatcher and llama3.2.
 
-        # Get matching words
-        matching_words = matcher.find_matches(pattern)
-        print(f"Found {len(matching_words)} matching words ")
-        print(f"{matching_words=}")
+    Returns the scored words and, if the LLM was unavailable and the words
+    were ranked locally instead, the reason why. ``matching_words`` skips
+    matching when the caller already has the matches.
+    """
+    try:
+        if matching_words is None:
+            matching_words = await match_words(letter_ranges, dictionary)
         if not matching_words:
-            return []
+            return [], None
 
         # Score and sort the matching words
-        scored_words = await score_words(matching_words, context)
-
-        return scored_words
+        try:
+            return await score_words(matching_words, context, deadline), None
+        except LLMUnavailableError as e:
+            FALLBACK_SCORES.labels(e.reason).inc()
+            ranked = await run_cpu_bound(
+                "rank_words",
+                len(matching_words),
+                get_local_ranker().rank,
+                matching_words,
+            )
+            return ranked, e.reason
 
     except Exception as e:
         logger.error(f"Error generating words: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate words")
 
 
-async def generate_sentences(word: str, context: str) -> List[str]:
-    """Generate contextually appropriate sentences using the selected word."""
+async def generate_sentences(
+    word: str,
+    context: str,
+    deadline: Optional[Deadline] = None,
+    cache: bool = True,
+) -> List[str]:
+    """
+    Generate contextually appropriate sentences using the selected word.
+
+    Raises ``LLMUnavailableError`` if the LLM can't answer before the deadline.
+    With ``cache`` off, new sentences are generated even if cached ones exist.
+    """
     prompt = f"""You are helping generate natural sentences for someone with ALS to communicate.
 
 Generate 1-4 conversational sentences that:
@@ -229,71 +408,326 @@ Return __only__ the sentences, one per line.
 Do not add "Here is the sentence:" or anything else. If unsure, return nothing."""
 
     try:
-        response = await client.chat(
-            model=MODEL,  # Using llama3.2 instruct model
-            messages=[{"role": "user", "content": prompt}],
-            stream=False,
-        )
+        with observe_stage("generate_sentences"):
+            response = await chat(prompt, deadline, "generate_sentences", cache)
+        observe_llm_response("generate_sentences", response)
 
-        return [
-            sent.strip()
-            for sent in response["message"]["content"].split("\n")
-            if sent.strip() and not sent.startswith("-")  # Filter out any bullet points
-        ]
+        return parse_sentences(response["message"]["content"])
 
+    except LLMUnavailableError as e:
+        logger.error(f"Error generating sentences: {e.reason}")
+        LLM_REQUESTS.labels("generate_sentences", e.reason).inc()
+        raise
     except Exception as e:
         logger.error(f"Error generating sentences: {e}")
+        LLM_REQUESTS.labels("generate_sentences", "error").inc()
         raise HTTPException(status_code=500, detail="Failed to generate sentences")
 
 
-@router.post("/predict", response_model=ChatResponse, tags=["prediction"])
-async def predict(input: ChatInput) -> ChatResponse:
+async def build_predictions(
+    letter_ranges: str,
+    context: str,
+    top_k: Optional[int] = None,
+    budget: Optional[float] = None,
+    matching_words: Optional[List[str]] = None,
+    dictionary: Optional[str] = None,
+) -> Dict[str, Any]:
     """
-    Generate word predictions and example sentences based on letter ranges and context.
-
-    Now includes confidence scores for each word.
+    Score words matching the letter ranges and generate sentences for the best one.
+
+    Only the ``top_k`` best words are returned; the rest of the ranking is
+    kept server-side behind ``next_cursor``. The result is a plain dict
+    in the shape of ``ChatResponse``.
+
+    Both LLM calls share a latency budget of ``budget`` seconds. If the
+    LLM is unavailable or the budget runs out, the words are ranked
+    locally, sentences are left empty and the result is flagged as
+    ``degraded``. Contexts and patterns found in the precomputed table
+    are answered from it without calling the LLM; the table only covers
+    the default dictionary.
     """
-    try:
-        # Generate and score matching words
-        scored_words = await generate_words(
-            input.context,
-            input.letter_ranges,
-            min_length=len(input.letter_ranges.split()),
+    top_k = top_k or settings.predict_top_k
+    table = get_precomputed_table()
+    if len(table) and dictionary in (None, settings.default_dictionary):
+        precomputed = table.lookup(context, letter_ranges)
+        record_cache("precomputed", precomputed is not None)
+        if precomputed is not None:
+            return prediction_result(*precomputed, top_k=top_k)
+    deadline = Deadline.after(budget or settings.predict_budget_seconds)
+    # Generate and score matching words
+    with observe_stage("generate_words"):
+        scored_words, degraded_reason = await generate_words(
+            context,
+            letter_ranges,
+            min_length=len(letter_ranges.split()),
+            deadline=deadline,
+            matching_words=matching_words,
+            dictionary=dictionary,
         )
 
-        if not scored_words:
-            return ChatResponse(prompt_options=[], sentences=[])
+    sentences: List[str] = []
+    if scored_words and degraded_reason is None:
+        # Generate sentences using the highest confidence word
+        try:
+            sentences = await generate_sentences(scored_words[0][0], context, deadline)
+        except LLMUnavailableError as e:
+            degraded_reason = e.reason
+
+    return prediction_result(scored_words, sentences, top_k, degraded_reason)
+
+
+def prediction_result(
+    scored_words: List[Tuple[str, float]],
+    sentences: List[str],
+    top_k: int,
+    degraded_reason: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Render predictions as a plain dict in the shape of ``ChatResponse``."""
+    return {
+        "prompt_options": prompt_options(scored_words, 0, top_k),
+        "sentences": sentences,
+        "next_cursor": (
+            get_ranked_list_store().cursor(scored_words, top_k)
+            if scored_words
+            else None
+        ),
+        "degraded": degraded_reason is not None,
+        "degraded_reason": degraded_reason,
+    }
+
+
+def check_dictionary(dictionary: Optional[str]) -> None:
+    """Reject requests for dictionaries that aren't registered."""
+    if dictionary is not None and dictionary not in get_dictionary_registry():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown dictionary {dictionary!r}",
+        )
 
-        # Create prompt options with confidence scores
-        prompt_options = [
-            PromptOption(id=i, prompt=word, confidence=score)
-            for i, (word, score) in enumerate(scored_words)
-        ]
 
-        # Generate sentences using the highest confidence word
-        sentences = await generate_sentences(scored_words[0][0], input.context)
+@router.get("/dictionaries", response_model=DictionariesResponse, tags=["prediction"])
+async def list_dictionaries() -> DictionariesResponse:
+    """List the dictionaries requests can choose from."""
+    registry = get_dictionary_registry()
+    return DictionariesResponse(
+        default=settings.default_dictionary,
+        dictionaries=registry.names(),
+        loaded=registry.loaded(),
+    )
 
-        return ChatResponse(
-            prompt_options=prompt_options,
-            sentences=sentences,
-        )
 
+@router.post("/predict", response_model=ChatResponse, tags=["prediction"])
+async def predict(input: ChatInput) -> UJSONResponse:
+    """
+    Generate word predictions and example sentences based on letter ranges and context.
+
+    Now includes confidence scores for each word.
+    """
+    check_dictionary(input.dictionary)
+    try:
+        with observe_stage("predict"):
+            predictions = await build_predictions(
+                input.letter_ranges,
+                input.context,
+                input.top_k,
+                input.budget_seconds,
+                dictionary=input.dictionary,
+            )
     except Exception as e:
         logger.error(f"Error in predict endpoint: {e}")
         raise HTTPException(
             status_code=500,
             detail="Failed to generate predictions",
         )
+    # Skip response model validation; the dict already has its shape.
+    with observe_stage("serialize"):
+        return UJSONResponse(predictions)
+
+
+async def _match_patterns(
+    patterns: Iterable[Tuple[Optional[str], str]],
+) -> Dict[Tuple[Optional[str], str], Union[List[str], str]]:
+    """
+    Match every distinct (dictionary, pattern) pair once.
+
+    Failures map to an error message.
+    """
+    matches: Dict[Tuple[Optional[str], str], Union[List[str], str]] = {}
+    for dictionary, pattern in patterns:
+        try:
+            check_dictionary(dictionary)
+            matches[dictionary, pattern] = await match_words(pattern, dictionary)
+        except HTTPException as e:
+            matches[dictionary, pattern] = e.detail
+        except Exception as e:
+            logger.error(f"Error matching {pattern!r}: {e}")
+            matches[dictionary, pattern] = "Failed to generate words"
+    return matches
+
+
+async def _predict_item(
+    item: ChatInput,
+    matching_words: Union[List[str], str],
+    semaphore: asyncio.Semaphore,
+) -> Dict[str, Any]:
+    """Predict a single batch item, turning failures into an error message."""
+    if isinstance(matching_words, str):
+        return {"result": None, "error": matching_words}
+    async with semaphore:
+        try:
+            result = await build_predictions(
+                item.letter_ranges,
+                item.context,
+                item.top_k,
+                item.budget_seconds,
+                matching_words=matching_words,
+                dictionary=item.dictionary,
+            )
+        except HTTPException as e:
+            return {"result": None, "error": e.detail}
+        except Exception as e:
+            logger.error(f"Error in batch prediction: {e}")
+            return {"result": None, "error": "Failed to generate predictions"}
+    return {"result": result, "error": None}
+
+
+@router.post("/predict/batch", response_model=BatchChatResponse, tags=["prediction"])
+async def predict_batch(input: BatchChatInput) -> UJSONResponse:
+    """
+    Predictions for several letter ranges and contexts at once.
+
+    Identical items are computed once. Matching for all items runs in a
+    single pass before any LLM call, and the LLM work is spread over at
+    most ``settings.predict_batch_concurrency`` concurrent predictions.
+    A failed item is reported in its ``error`` field and doesn't fail the
+    batch.
+    """
+    if len(input.items) > settings.predict_batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.predict_batch_max_items} items are allowed",
+        )
+    unique: Dict[Tuple[Any, ...], ChatInput] = {}
+    keys = []
+    for item in input.items:
+        pattern = " ".join(item.letter_ranges.upper().split())
+        key = (item.dictionary, pattern, item.context, item.top_k, item.budget_seconds)
+        unique.setdefault(key, item)
+        keys.append(key)
+
+    matches = await _match_patterns({key[:2] for key in unique})
+    semaphore = asyncio.Semaphore(settings.predict_batch_concurrency)
+    results = await asyncio.gather(
+        *(
+            _predict_item(item, matches[key[:2]], semaphore)
+            for key, item in unique.items()
+        ),
+    )
+    by_key = dict(zip(unique, results))
+    return UJSONResponse({"results": [by_key[key] for key in keys]})
+
+
+@router.post("/predict/next", response_model=NextWordResponse, tags=["prediction"])
+async def predict_next_words(input: NextWordInput) -> UJSONResponse:
+    """
+    Likely next words after the words selected so far.
+
+    Answered by the local n-gram model (``settings.ngram_file``) without
+    calling the LLM. With ``letter_ranges`` only words starting with
+    letters in those ranges are returned.
+    """
+    model = get_ngram_model()
+    if model is None:
+        raise HTTPException(status_code=503, detail="Next-word model not configured")
+    allowed = None
+    if input.letter_ranges:
+        try:
+            letter_sets = parse_letter_ranges(input.letter_ranges)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid letter ranges")
+
+        def allowed(word: str) -> bool:
+            return len(word) >= len(letter_sets) and all(
+                letter in letters for letter, letters in zip(word, letter_sets)
+            )
+
+    with observe_stage("next_words"):
+        predicted = model.predict(input.words, input.limit, allowed)
+    ranked = [(word, round(score * 100, 2)) for word, score in predicted]
+    return UJSONResponse({"prompt_options": prompt_options(ranked, 0, input.limit)})
+
+
+@router.get(
+    "/predict/options",
+    response_model=PromptOptionsPage,
+    tags=["prediction"],
+)
+async def predict_options(
+    cursor: str,
+    limit: int = Query(4, ge=1, le=100),
+) -> UJSONResponse:
+    """Page through the rest of the ranked prompt options of a prediction."""
+    try:
+        options, next_cursor = get_ranked_list_store().page(cursor, limit)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Cursor expired or unknown")
+    return UJSONResponse({"prompt_options": options, "next_cursor": next_cursor})
 
 
 @router.post("/sentences", tags=["sentences"])
 async def get_sentences(selector: WordSelector) -> List[str]:
     """Generate new sentences for a selected word and context."""
     try:
-        return await generate_sentences(selector.word, selector.context)
+        return await generate_sentences(
+            selector.word,
+            selector.context,
+            Deadline.after(settings.predict_budget_seconds),
+            cache=False,
+        )
+    except LLMUnavailableError:
+        raise HTTPException(status_code=503, detail="Sentence generation unavailable")
     except Exception as e:
         logger.error(f"Error generating sentences: {e}")
         raise HTTPException(
             status_code=500,
             detail="Failed to generate sentences",
         )
+
+
+@router.websocket("/predict/session")
+async def predict_session(
+    websocket: WebSocket,
+    dictionary: Optional[str] = None,
+) -> None:
+    """
+    Keyboard session with incremental updates.
+
+    The client sends JSON deltas (see ``SessionUpdate``) whenever the
+    letter ranges or the context change. Bursts of updates are debounced,
+    in-flight predictions for superseded state are cancelled, and only
+    predictions for the latest state are pushed back, tagged with the
+    ``version`` of the state they were computed for. The dictionary is
+    chosen for the whole session with the ``dictionary`` query parameter.
+    """
+    if dictionary is not None and dictionary not in get_dictionary_registry():
+        await websocket.close(code=1008, reason="Unknown dictionary")
+        return
+    await websocket.accept()
+    session = PredictionSession(
+        websocket,
+        predict=partial(build_predictions, dictionary=dictionary),
+        debounce=settings.session_debounce_seconds,
+    )
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                update = SessionUpdate.model_validate_json(message)
+            except ValidationError as e:
+                await websocket.send_json({"error": str(e)})
+                continue
+            session.apply(update)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await session.close()
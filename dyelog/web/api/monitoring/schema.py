@@ -0,0 +1,12 @@
+from typing import Dict
+
+from pydantic import BaseModel
+
+
+class HealthResponse(BaseModel):
+    """Health and readiness of the worker."""
+
+    # "starting", "ready" or "degraded" when a startup phase failed
+    status: str
+    phases: Dict[str, float]
+    errors: Dict[str, str]
@@ -1,12 +1,28 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+
+from dyelog.web.api.monitoring.schema import HealthResponse
 
 router = APIRouter()
 
 
-@router.get("/health")
-def health_check() -> None:
+@router.get("/health", response_model=HealthResponse)
+def health_check(request: Request) -> HealthResponse:
     """
     Checks the health of a project.
 
-    It returns 200 if the project is healthy.
+    It returns 200 if the project is healthy. The body reports
+    whether startup has finished and how long each phase took.
     """
+    state = getattr(request.app.state, "startup", None)
+    if state is None:
+        return HealthResponse(status="starting", phases={}, errors={})
+    health_status = "ready"
+    if not state.ready:
+        health_status = "starting"
+    elif state.errors:
+        health_status = "degraded"
+    return HealthResponse(
+        status=health_status,
+        phases=state.phases,
+        errors=state.errors,
+    )
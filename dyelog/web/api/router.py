@@ -1,9 +1,10 @@
 from fastapi.routing import APIRouter
 
-from dyelog.web.api import chat, docs, monitoring, speech
+from dyelog.web.api import admin, chat, docs, monitoring, speech
 
 api_router = APIRouter()
 api_router.include_router(monitoring.router)
 api_router.include_router(docs.router)
 api_router.include_router(chat.router)
 api_router.include_router(speech.router, tags=["speech"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
@@ -1,5 +1,7 @@
 # Pydantic model for request body
-from pydantic import BaseModel
+from typing import List
+
+from pydantic import BaseModel, Field
 
 
 class TextToSpeechInput(BaseModel):
@@ -8,8 +10,22 @@ class TextToSpeechInput(BaseModel):
     text: str
 
 
+class BatchTextToSpeechInput(BaseModel):
+    """Input model for batch text to speech."""
+
+    texts: List[str] = Field(..., min_length=1)
+
+
 class SpeechToTextResponse(BaseModel):
     """Response model for speech to text."""
 
     text: str
     confidence: float
+
+
+class StreamingTranscriptResponse(BaseModel):
+    """Message pushed to the client during streaming transcription."""
+
+    text: str
+    confidence: float
+    is_final: bool
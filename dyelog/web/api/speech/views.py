@@ -1,106 +1,398 @@
-from fastapi import APIRouter, File, HTTPException, UploadFile
-from google.cloud import speech, texttospeech
-from starlette.responses import Response
+import asyncio
+import time
+import uuid
+from typing import AsyncIterator, List, Optional, Tuple
 
-from dyelog.web.api.speech.schema import SpeechToTextResponse, TextToSpeechInput
+import ujson
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    UploadFile,
+    WebSocket,
+    status,
+)
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+
+from dyelog.metrics import STAGE_DURATION, observe_stage
+from dyelog.services.speech import (
+    RECOGNITION_ENCODINGS,
+    SYNTHESIS_ENCODINGS,
+    VOICES,
+    RecognitionConfig,
+    SpeechBackend,
+    SynthesisConfig,
+    get_speech_backend,
+)
+from dyelog.settings import settings
+from dyelog.web.api.speech.schema import (
+    BatchTextToSpeechInput,
+    SpeechToTextResponse,
+    StreamingTranscriptResponse,
+    TextToSpeechInput,
+)
 
 router = APIRouter()
-# Initialize the Text-to-Speech tts_client
-tts_client = texttospeech.TextToSpeechClient()
-stt_client = speech.SpeechClient()
-
-
-def get_voice(voice: str) -> int:
-    """Get the voice object based on the voice name."""
-    if voice == "FEMALE":
-        return texttospeech.SsmlVoiceGender.FEMALE
-    elif voice == "MALE":  # noqa: RET505
-        return texttospeech.SsmlVoiceGender.MALE
-    elif voice == "NEUTRAL":
-        return texttospeech.SsmlVoiceGender.NEUTRAL
-    elif voice == "UNKNOWN":
-        return texttospeech.SsmlVoiceGender.SSML_VOICE_GENDER_UNSPECIFIED
-    else:
+# Media types a client may list in ``Accept`` instead of passing ``encoding``.
+ACCEPT_ENCODINGS = {
+    "audio/mpeg": "MP3",
+    "audio/mp3": "MP3",
+    "audio/ogg": "OGG_OPUS",
+    "audio/opus": "OGG_OPUS",
+    "audio/wav": "LINEAR16",
+    "audio/l16": "LINEAR16",
+}
+DEFAULT_ENCODING = "MP3"
+
+
+def accepted_media_types(accept: str) -> List[str]:
+    """
+    Media types of an ``Accept`` header, most preferred first.
+
+    Types with ``q=0`` or a malformed ``q`` are dropped; types of equal
+    quality keep the order they are listed in.
+
+    :param accept: header value.
+    :return: lowercase media types.
+    """
+    weighted = []
+    for entry in accept.split(","):
+        media_type, *params = (part.strip() for part in entry.split(";"))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type and quality > 0:
+            weighted.append((quality, media_type.lower()))
+    weighted.sort(key=lambda item: -item[0])
+    return [media_type for _, media_type in weighted]
+
+
+def get_voice(voice: str) -> str:
+    """Validate the voice name."""
+    if voice not in VOICES:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid voice name: {voice}",
         )
+    return voice
+
+
+def get_synthesis_config(
+    request: Request,
+    voice: Optional[str] = None,
+    encoding: Optional[str] = None,
+    sample_rate_hertz: Optional[int] = Query(None, ge=8000, le=48000),
+) -> SynthesisConfig:
+    """
+    Negotiate synthesis parameters for the request.
+
+    An explicit ``encoding`` wins; otherwise the most preferred supported
+    media type in the ``Accept`` header is used. Wildcards and headers
+    without a supported type get MP3.
+
+    :param request: current request.
+    :param voice: voice gender, ``settings.voice`` if unset.
+    :param encoding: audio encoding, e.g. MP3, OGG_OPUS or LINEAR16.
+    :param sample_rate_hertz: output sample rate, the voice's natural rate if unset.
+    :return: synthesis config.
+    """
+    if encoding is None:
+        encoding = DEFAULT_ENCODING
+        for media_type in accepted_media_types(request.headers.get("accept", "")):
+            if media_type in {"audio/*", "*/*"}:
+                break
+            if media_type in ACCEPT_ENCODINGS:
+                encoding = ACCEPT_ENCODINGS[media_type]
+                break
+    encoding = encoding.upper()
+    if encoding not in SYNTHESIS_ENCODINGS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid audio encoding: {encoding}",
+        )
+    return SynthesisConfig(
+        voice=get_voice(voice or settings.voice),
+        encoding=encoding,
+        sample_rate_hertz=sample_rate_hertz,
+    )
+
+
+def get_recognition_config(
+    language_code: str = "en-US",
+    encoding: str = "MP3",
+    sample_rate_hertz: int = Query(16000, ge=8000, le=48000),
+) -> RecognitionConfig:
+    """
+    Recognition parameters for the request.
+
+    :param language_code: language of the speech.
+    :param encoding: encoding of the uploaded audio.
+    :param sample_rate_hertz: sample rate of the uploaded audio.
+    :return: recognition config.
+    """
+    encoding = encoding.upper()
+    if encoding not in RECOGNITION_ENCODINGS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid audio encoding: {encoding}",
+        )
+    return RecognitionConfig(
+        language_code=language_code,
+        encoding=encoding,
+        sample_rate_hertz=sample_rate_hertz,
+    )
 
 
 @router.post("/synthesize-speech")
 async def synthesize_speech(
     input_data: TextToSpeechInput,
-    voice: str = "FEMALE",
-) -> Response:
-    """Synthesizes speech from the input text and returns an audio file."""
-    voice_code: int = get_voice(voice)
-    try:
-        # Create a synthesis request
-        synthesis_input = texttospeech.SynthesisInput(text=input_data.text)
-        voice = texttospeech.VoiceSelectionParams(
-            language_code="en-US",
-            ssml_gender=voice_code,
-        )
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.MP3,
-        )
+    config: SynthesisConfig = Depends(get_synthesis_config),
+    backend: SpeechBackend = Depends(get_speech_backend),
+) -> StreamingResponse:
+    """
+    Synthesizes speech from the input text and returns an audio file.
 
-        response = tts_client.synthesize_speech(
-            input=synthesis_input,
-            voice=voice,
-            audio_config=audio_config,
-        )
-        return Response(
-            content=response.audio_content,
-            media_type="audio/mp3",
-            status_code=200,
-            headers={"Content-Disposition": "attachment; filename=speech.mp3"},
-        )
+    The audio is streamed in chunks so playback can start before
+    the whole clip has been transferred.
+    """
+    media_type, extension = SYNTHESIS_ENCODINGS[config.encoding]
+    chunks = backend.synthesize_stream(
+        input_data.text,
+        config,
+        settings.tts_stream_chunk_bytes,
+    )
+    try:
+        # Wait for the first chunk so synthesis errors still produce a 500.
+        with observe_stage("speech_synthesize"):
+            first_chunk = await chunks.__anext__()
+    except StopAsyncIteration:
+        first_chunk = b""
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error synthesizing speech: {e}",
         ) from None
 
+    async def audio() -> AsyncIterator[bytes]:
+        yield first_chunk
+        async for chunk in chunks:
+            yield chunk
+
+    return StreamingResponse(
+        audio(),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename=speech.{extension}",
+        },
+    )
+
+
+def _multipart_part(
+    boundary: str,
+    index: int,
+    content: bytes,
+    media_type: str,
+    extension: str,
+) -> bytes:
+    """Encode a single part of a multipart/mixed body."""
+    headers = (
+        f"--{boundary}\r\n"
+        f"Content-Type: {media_type}\r\n"
+        f"Content-ID: <{index}>\r\n"
+        f"Content-Disposition: attachment; filename=speech-{index}.{extension}\r\n"
+        "\r\n"
+    )
+    return headers.encode("latin-1") + content + b"\r\n"
+
+
+async def _synthesize_batch(
+    texts: List[str],
+    config: SynthesisConfig,
+    backend: SpeechBackend,
+    boundary: str,
+) -> AsyncIterator[bytes]:
+    """
+    Synthesize texts concurrently and yield each clip as soon as it's ready.
+
+    Parts are emitted in completion order; ``Content-ID`` holds the index
+    of the text the clip belongs to, e.g. ``<0>``. A failed synthesis is reported as a
+    JSON part instead of failing the whole response.
+    """
+    semaphore = asyncio.Semaphore(settings.tts_batch_concurrency)
+
+    media_type, extension = SYNTHESIS_ENCODINGS[config.encoding]
+
+    async def synthesize(index: int, text: str) -> Tuple[int, bytes, str, str]:
+        async with semaphore:
+            try:
+                with observe_stage("speech_synthesize"):
+                    audio = await backend.synthesize(text, config)
+                return index, audio, media_type, extension
+            except Exception as e:
+                detail = ujson.dumps({"detail": f"Error synthesizing speech: {e}"})
+                return index, detail.encode(), "application/json", "json"
+
+    tasks = [
+        asyncio.ensure_future(synthesize(index, text))
+        for index, text in enumerate(texts)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield _multipart_part(boundary, *await next_done)
+        yield f"--{boundary}--\r\n".encode("latin-1")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@router.post("/synthesize-speech/batch")
+async def synthesize_speech_batch(
+    input_data: BatchTextToSpeechInput,
+    config: SynthesisConfig = Depends(get_synthesis_config),
+    backend: SpeechBackend = Depends(get_speech_backend),
+) -> StreamingResponse:
+    """
+    Synthesizes several texts at once.
+
+    The texts are synthesized concurrently and returned as a streamed
+    ``multipart/mixed`` response, so every clip is playable after roughly
+    one synthesis latency.
+    """
+    if len(input_data.texts) > settings.tts_batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.tts_batch_max_items} texts are allowed",
+        )
+    boundary = uuid.uuid4().hex
+    return StreamingResponse(
+        _synthesize_batch(input_data.texts, config, backend, boundary),
+        media_type=f"multipart/mixed; boundary={boundary}",
+    )
+
 
 @router.post("/transcribe-speech", response_model=SpeechToTextResponse)
 async def transcribe_speech(
     audio_file: UploadFile = File(...),
-    language_code: str = "en-US",
+    config: RecognitionConfig = Depends(get_recognition_config),
+    backend: SpeechBackend = Depends(get_speech_backend),
 ) -> SpeechToTextResponse:
     """Transcribes speech from an audio file and returns the text."""
     try:
         # Read the audio file
         content = await audio_file.read()
+        with observe_stage("speech_recognize"):
+            transcript = await backend.recognize(content, config)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error transcribing speech: {e}",
+        ) from None
 
-        # Configure the recognition request
-        audio = speech.RecognitionAudio(content=content)
-        config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.MP3,
-            sample_rate_hertz=16000,  # You might want to make this configurable
-            language_code=language_code,
-            enable_automatic_punctuation=True,
+    if transcript is None:
+        raise HTTPException(
+            status_code=400,
+            detail="No speech could be recognized in the audio file",
         )
+    return SpeechToTextResponse(
+        text=transcript.text,
+        confidence=transcript.confidence,
+    )
+
+
+class _WebSocketAudio:
+    """Reads audio chunks sent by a websocket client."""
+
+    def __init__(self, websocket: WebSocket) -> None:
+        self.websocket = websocket
+        self.disconnected = False
+        self.oversized = False
+        # When the client stopped sending audio, to measure finalization latency
+        self.ended_at: Optional[float] = None
 
-        # Perform the transcription
-        response = stt_client.recognize(config=config, audio=audio)
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """
+        Yield binary frames until a text frame or a disconnect arrives.
 
-        # Get the most likely transcription
-        if not response.results:
-            raise HTTPException(
-                status_code=400,
-                detail="No speech could be recognized in the audio file",
+        :yield: audio chunks.
+        """
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    self.disconnected = True
+                    return
+                chunk = message.get("bytes")
+                if chunk is None:
+                    return
+                if len(chunk) > settings.speech_stream_max_chunk_bytes:
+                    self.oversized = True
+                    return
+                yield chunk
+        finally:
+            self.ended_at = time.perf_counter()
+
+    def observe_final(self) -> None:
+        """Record the delay between the end of the audio and a final transcript."""
+        if self.ended_at is not None:
+            STAGE_DURATION.labels("speech_stream_finalize").observe(
+                time.perf_counter() - self.ended_at,
             )
 
-        transcript = response.results[0].alternatives[0]
 
-        return SpeechToTextResponse(
-            text=transcript.transcript,
-            confidence=transcript.confidence,
-        )
+@router.websocket("/transcribe-stream")
+async def transcribe_stream(
+    websocket: WebSocket,
+    config: RecognitionConfig = Depends(get_recognition_config),
+    backend: SpeechBackend = Depends(get_speech_backend),
+) -> None:
+    """
+    Transcribes speech while it is being recorded.
 
+    The client sends audio as binary frames and any text frame
+    (e.g. ``"end"``) once recording has stopped. Interim and final
+    transcripts are pushed back as JSON as soon as they are recognized.
+
+    :param websocket: current websocket connection.
+    :param config: recognition parameters.
+    :param backend: speech recognition backend.
+    """
+    await websocket.accept()
+    audio = _WebSocketAudio(websocket)
+    try:
+        async for transcript in backend.streaming_recognize(audio.chunks(), config):
+            if audio.disconnected:
+                return
+            if transcript.is_final:
+                audio.observe_final()
+            await websocket.send_json(
+                StreamingTranscriptResponse(
+                    text=transcript.text,
+                    confidence=transcript.confidence,
+                    is_final=transcript.is_final,
+                ).model_dump(),
+            )
     except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error transcribing speech: {e}",
-        ) from None
+        if not audio.disconnected:
+            await websocket.close(
+                code=status.WS_1011_INTERNAL_ERROR,
+                reason=f"Error transcribing speech: {e}"[:120],
+            )
+        return
+
+    if audio.disconnected:
+        return
+    if audio.oversized:
+        await websocket.close(
+            code=status.WS_1009_MESSAGE_TOO_BIG,
+            reason="Audio chunk too large",
+        )
+        return
+    await websocket.close()
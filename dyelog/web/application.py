@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-import traceback
+import logging
 from importlib import metadata
 from pathlib import Path
 from typing import Any
@@ -12,10 +12,14 @@ from fastapi.staticfiles import StaticFiles
 from starlette.requests import Request
 from starlette.responses import Response
 
+from dyelog.log import configure_logging
+from dyelog.settings import settings
+from dyelog.tracing import TracingMiddleware
 from dyelog.web.api.router import api_router
 from dyelog.web.lifespan import lifespan_setup
 
 APP_ROOT = Path(__file__).parent.parent
+logger = logging.getLogger(__name__)
 
 
 def get_app() -> FastAPI:
@@ -26,6 +30,7 @@ def get_app() -> FastAPI:
 
     :return: application.
     """
+    configure_logging()
     app = FastAPI(
         title="dyelog",
         version=metadata.version("dyelog"),
@@ -43,7 +48,10 @@ def get_app() -> FastAPI:
         try:
             return await call_next(request)
         except Exception as e:
-            print(traceback.format_exc())
+            logger.exception(
+                "Unhandled error",
+                extra={"fields": {"method": request.method, "path": request.url.path}},
+            )
             raise e
 
     app.add_middleware(
@@ -54,6 +62,9 @@ def get_app() -> FastAPI:
         allow_headers=["*"],
     )
     app.middleware("http")(catch_exceptions_middleware)
+    if settings.trace_enabled:
+        # Outermost, so the trace covers the other middleware too.
+        app.add_middleware(TracingMiddleware)
     # Main router for the API.
     app.include_router(router=api_router, prefix="/api")
     # Adds static directory.
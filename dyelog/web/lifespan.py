@@ -1,11 +1,54 @@
-from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Dict, Iterator
 
 from fastapi import FastAPI
 from prometheus_fastapi_instrumentator.instrumentation import (
     PrometheusFastApiInstrumentator,
 )
 
+from dyelog.services.llm import get_llm_cache, get_ollama_client
+from dyelog.services.speech import get_speech_backend
+from dyelog.utils import get_incremental_matcher, get_ngram_model
+from dyelog.web.api.chat.pagination import get_ranked_list_store
+from dyelog.web.api.chat.precomputed import get_precomputed_table
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StartupState:
+    """Startup progress of the application, reported by the health check."""
+
+    ready: bool = False
+    # Duration of every startup phase in seconds
+    phases: Dict[str, float] = field(default_factory=dict)
+    # Phases that failed, with the error message
+    errors: Dict[str, str] = field(default_factory=dict)
+
+
+@contextmanager
+def startup_phase(state: StartupState, name: str) -> Iterator[None]:
+    """
+    Time a startup phase and record its failure instead of crashing.
+
+    :param state: startup state to update.
+    :param name: name of the phase.
+    :yield: nothing.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        logger.exception("Startup phase %s failed", name)
+        state.errors[name] = str(e)
+    finally:
+        state.phases[name] = round(time.perf_counter() - start, 4)
+        logger.info("Startup phase %s took %.3fs", name, state.phases[name])
+
 
 def setup_prometheus(app: FastAPI) -> None:  # pragma: no cover
     """
@@ -28,12 +71,37 @@ async def lifespan_setup(
     This function uses fastAPI app to store data
     in the state, such as db_engine.
 
+    Heavy clients and indexes are created here rather than at import,
+    so a missing credential degrades a single feature instead of
+    crashing the worker.
+
     :param app: the fastAPI application.
     :return: function that actually performs actions.
     """
+    state = StartupState()
+    app.state.startup = state
 
-    app.middleware_stack = None
-    setup_prometheus(app)
-    app.middleware_stack = app.build_middleware_stack()
+    with startup_phase(state, "prometheus"):
+        app.middleware_stack = None
+        setup_prometheus(app)
+        app.middleware_stack = app.build_middleware_stack()
+    with startup_phase(state, "matcher"):
+        await asyncio.to_thread(get_incremental_matcher)
+    with startup_phase(state, "precomputed"):
+        table = await asyncio.to_thread(get_precomputed_table)
+        if table.error is not None:
+            state.errors["precomputed"] = table.error
+    with startup_phase(state, "ngram"):
+        await asyncio.to_thread(get_ngram_model)
+    with startup_phase(state, "ollama"):
+        get_ollama_client()
+    with startup_phase(state, "llm_cache"):
+        await asyncio.to_thread(get_llm_cache)
+    with startup_phase(state, "prompt_cursors"):
+        await asyncio.to_thread(get_ranked_list_store)
+    with startup_phase(state, "speech"):
+        await asyncio.to_thread(get_speech_backend)
+    state.ready = True
+    logger.info("Startup finished in %.3fs", sum(state.phases.values()))
 
     yield
@@ -0,0 +1,62 @@
+from typing import List
+
+from dyelog.services.llm.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def make_breaker(now: List[float]) -> CircuitBreaker:
+    """
+    Breaker with a threshold of 2 and a clock controlled by the test.
+
+    :param now: single-item list holding the current time.
+    :return: circuit breaker.
+    """
+    return CircuitBreaker(failure_threshold=2, reset_timeout=10.0, clock=lambda: now[0])
+
+
+def test_opens_after_consecutive_failures() -> None:
+    """Only consecutive failures count towards the threshold."""
+    now = [0.0]
+    breaker = make_breaker(now)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_half_open_probe() -> None:
+    """After the reset timeout a single probe decides the state."""
+    now = [0.0]
+    breaker = make_breaker(now)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    now[0] = 10.0
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    now[0] = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_release_frees_probe() -> None:
+    """A released probe lets the next call probe without changing the state."""
+    now = [0.0]
+    breaker = make_breaker(now)
+    breaker.record_failure()
+    breaker.record_failure()
+
+    now[0] = 10.0
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
@@ -0,0 +1,331 @@
+import asyncio
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Tuple
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from starlette import status
+from starlette.testclient import TestClient
+
+from dyelog.services.llm import Deadline, LLMUnavailableError, chat, get_circuit_breaker
+from dyelog.services.llm import client as llm_client
+from dyelog.services.llm.breaker import CLOSED, HALF_OPEN
+from dyelog.settings import settings
+from dyelog.web.api.chat import views
+from dyelog.web.api.chat.pagination import RankedListStore
+
+
+@pytest.fixture
+def fake_llm(monkeypatch: pytest.MonkeyPatch) -> List[str]:
+    """
+    Replace LLM calls with deterministic fakes.
+
+    :param monkeypatch: pytest monkeypatch.
+    :return: contexts sentences were generated for.
+    """
+    calls: List[str] = []
+
+    async def score_words(
+        words: List[str],
+        context: str,
+        deadline: Optional[Deadline] = None,
+    ) -> List[Tuple[str, float]]:
+        await asyncio.sleep(0.05)
+        scored = [(word, 90.0 if word == "PARIS" else 50.0) for word in sorted(words)]
+        return sorted(scored, key=lambda x: x[1], reverse=True)
+
+    async def generate_sentences(
+        word: str,
+        context: str,
+        deadline: Optional[Deadline] = None,
+    ) -> List[str]:
+        calls.append(context)
+        return [f"{context} {word.lower()}."]
+
+    monkeypatch.setattr(views, "score_words", score_words)
+    monkeypatch.setattr(views, "generate_sentences", generate_sentences)
+    return calls
+
+
+def test_session_pushes_latest_predictions(
+    fastapi_app: FastAPI,
+    fake_llm: List[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A burst of updates yields a single prediction for the final state."""
+    monkeypatch.setattr(settings, "session_debounce_seconds", 0.05)
+    with TestClient(fastapi_app).websocket_connect("/api/predict/session") as ws:
+        ws.send_json({"context": "I want", "letter_ranges": "N-T A-F"})
+        ws.send_json({"append_range": "N-T"})
+        ws.send_json({"append_range": "G-M"})
+        ws.send_json({"append_range": "N-T"})
+        response = ws.receive_json()
+    assert response["version"] == 4
+    assert "PARIS" in [option["prompt"] for option in response["prompt_options"]]
+    assert fake_llm == ["I want"]
+
+
+def test_session_remove_last_range(
+    fastapi_app: FastAPI,
+    fake_llm: List[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Removing every range returns empty predictions without calling the LLM."""
+    monkeypatch.setattr(settings, "session_debounce_seconds", 0.0)
+    with TestClient(fastapi_app).websocket_connect("/api/predict/session") as ws:
+        ws.send_json({"letter_ranges": "N-T", "remove_last_range": True})
+        response = ws.receive_json()
+    assert response == {
+        "version": 1,
+        "prompt_options": [],
+        "sentences": [],
+        "next_cursor": None,
+        "degraded": False,
+        "degraded_reason": None,
+    }
+    assert fake_llm == []
+
+
+def test_session_invalid_update(fastapi_app: FastAPI) -> None:
+    """Malformed updates are reported without closing the session."""
+    with TestClient(fastapi_app).websocket_connect("/api/predict/session") as ws:
+        ws.send_text("not json")
+        assert "error" in ws.receive_json()
+
+
+@pytest.mark.anyio
+async def test_predict_top_k_and_paging(
+    client: AsyncClient,
+    fake_llm: List[str],
+) -> None:
+    """Predict returns the top K options and a cursor for the rest."""
+    response = await client.post(
+        "/api/predict",
+        json={"letter_ranges": "N-T A-F N-T", "context": "Hi", "top_k": 2},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert [option["id"] for option in body["prompt_options"]] == [0, 1]
+    assert body["sentences"]
+
+    seen = [option["prompt"] for option in body["prompt_options"]]
+    cursor = body["next_cursor"]
+    while cursor is not None:
+        page = await client.get(
+            "/api/predict/options",
+            params={"cursor": cursor, "limit": 50},
+        )
+        assert page.status_code == status.HTTP_200_OK
+        seen.extend(option["prompt"] for option in page.json()["prompt_options"])
+        cursor = page.json()["next_cursor"]
+    assert "PAR" in seen
+    assert len(seen) == len(set(seen))
+
+
+def test_cursor_shared_by_stores(tmp_path: Path) -> None:
+    """A cursor of one worker's store is paged through by another worker's."""
+    path = tmp_path / "cursors.sqlite3"
+    ranked = [("PAR", 90.0), ("PA", 50.0), ("PAD", 10.0)]
+    cursor = RankedListStore(path, ttl=60, max_entries=10).cursor(ranked, 1)
+    assert cursor is not None
+
+    store = RankedListStore(path, ttl=60, max_entries=10)
+    options, next_cursor = store.page(cursor, 1)
+    assert options == [{"id": 1, "prompt": "PA", "confidence": 50.0}]
+    assert next_cursor is not None
+    options, next_cursor = store.page(next_cursor, 5)
+    assert [option["prompt"] for option in options] == ["PAD"]
+    assert next_cursor is None
+
+
+def test_cursor_expiry_and_eviction(tmp_path: Path) -> None:
+    """Expired rankings aren't served and the oldest are evicted."""
+    store = RankedListStore(tmp_path / "cursors.sqlite3", ttl=60, max_entries=1)
+    ranked = [("PAR", 90.0), ("PA", 50.0)]
+    first = store.cursor(ranked, 1)
+    second = store.cursor(ranked, 1)
+    assert first is not None and second is not None
+    store.evict()
+    with pytest.raises(KeyError):
+        store.page(first, 1)
+    assert store.page(second, 1)[0]
+
+    store.ttl = -1
+    expired = store.cursor(ranked, 1)
+    assert expired is not None
+    with pytest.raises(KeyError):
+        store.page(expired, 1)
+
+
+@pytest.mark.anyio
+async def test_predict_options_unknown_cursor(client: AsyncClient) -> None:
+    """Unknown cursors are reported as not found."""
+    response = await client.get("/api/predict/options", params={"cursor": "nope.4"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+class SlowOllama:
+    """Ollama client stand-in that takes ``delay`` seconds or fails."""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False) -> None:
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    async def chat(self, **kwargs: Any) -> Any:
+        """
+        Answer a chat request.
+
+        :param kwargs: ignored.
+        :raises ConnectionError: if failing.
+        :return: chat response scoring THE.
+        """
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("ollama is down")
+        return {"message": {"content": "THE:90"}}
+
+
+@pytest.fixture
+def slow_ollama(monkeypatch: pytest.MonkeyPatch) -> Iterator[SlowOllama]:
+    """
+    Replace the Ollama client and reset the circuit breaker.
+
+    :param monkeypatch: pytest monkeypatch.
+    :yield: fake client.
+    """
+    ollama = SlowOllama()
+    monkeypatch.setattr(llm_client, "get_ollama_client", lambda: ollama)
+    get_circuit_breaker.cache_clear()
+    yield ollama
+    get_circuit_breaker.cache_clear()
+
+
+@pytest.mark.anyio
+async def test_predict_budget_exhausted(
+    client: AsyncClient,
+    slow_ollama: SlowOllama,
+) -> None:
+    """A slow LLM yields a locally ranked, flagged response within the budget."""
+    slow_ollama.delay = 5.0
+    response = await client.post(
+        "/api/predict",
+        json={"letter_ranges": "N-T G-M A-F", "context": "Hi", "budget_seconds": 0.1},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert body["degraded"] is True
+    assert body["degraded_reason"] == "budget_exhausted"
+    assert body["sentences"] == []
+    # "the" is the most frequent word in the frequency list
+    assert body["prompt_options"][0]["prompt"] == "THE"
+
+
+@pytest.mark.anyio
+async def test_short_budgets_keep_breaker_closed(
+    client: AsyncClient,
+    slow_ollama: SlowOllama,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Budgets running out are the caller's doing, not Ollama failures."""
+    monkeypatch.setattr(settings, "ollama_breaker_failures", 2)
+    slow_ollama.delay = 5.0
+    payload = {"letter_ranges": "N-T G-M A-F", "context": "Hi", "budget_seconds": 0.05}
+    for _ in range(3):
+        response = await client.post("/api/predict", json=payload)
+        assert response.json()["degraded_reason"] == "budget_exhausted"
+    assert get_circuit_breaker().state == CLOSED
+
+
+@pytest.mark.anyio
+async def test_cancelled_probe_is_released(slow_ollama: SlowOllama) -> None:
+    """Cancelling the half-open probe lets the next call probe."""
+    breaker = get_circuit_breaker()
+    breaker.reset_timeout = 0.0
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    slow_ollama.delay = 5.0
+
+    probe = asyncio.create_task(chat("Score", Deadline.after(10)))
+    await asyncio.sleep(0.05)
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+    assert breaker.state == HALF_OPEN
+
+    slow_ollama.delay = 0.0
+    await chat("Score")
+    assert breaker.state == CLOSED
+    slow_ollama.fail = True
+    with pytest.raises(LLMUnavailableError):
+        await chat("Score")
+
+
+@pytest.mark.anyio
+async def test_predict_circuit_open(
+    client: AsyncClient,
+    slow_ollama: SlowOllama,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Once the breaker trips, predictions skip the LLM entirely."""
+    monkeypatch.setattr(settings, "ollama_breaker_failures", 2)
+    slow_ollama.fail = True
+    payload = {"letter_ranges": "N-T G-M A-F", "context": "Hi"}
+    reasons = []
+    for _ in range(3):
+        response = await client.post("/api/predict", json=payload)
+        assert response.status_code == status.HTTP_200_OK
+        reasons.append(response.json()["degraded_reason"])
+    assert reasons == ["error", "error", "circuit_open"]
+    assert slow_ollama.calls == 2
+
+    response = await client.post(
+        "/api/sentences",
+        json={"word": "THE", "context": "Hi"},
+    )
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+
+@pytest.mark.anyio
+async def test_predict_batch(
+    client: AsyncClient,
+    fake_llm: List[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Duplicates are computed once and a bad item doesn't fail the batch."""
+    monkeypatch.setattr(settings, "predict_batch_concurrency", 2)
+    paris = {"letter_ranges": "N-T A-F N-T G-M N-T", "context": "Where?"}
+    response = await client.post(
+        "/api/predict/batch",
+        json={
+            "items": [
+                paris,
+                {"letter_ranges": "A-F A-F", "context": "Hi"},
+                {**paris, "letter_ranges": "n-t a-f  n-t g-m n-t"},
+                {"letter_ranges": "A-C", "context": "Hi"},
+            ],
+        },
+    )
+    assert response.status_code == status.HTTP_200_OK
+    results = response.json()["results"]
+    assert len(results) == 4
+    assert results[0]["result"]["prompt_options"][0]["prompt"] == "PARIS"
+    assert results[0] == results[2]
+    assert results[1]["error"] is None
+    assert results[3]["result"] is None
+    assert results[3]["error"]
+    assert sorted(fake_llm) == ["Hi", "Where?"]
+
+
+@pytest.mark.anyio
+async def test_predict_batch_too_large(
+    client: AsyncClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Batches over the configured size are rejected."""
+    monkeypatch.setattr(settings, "predict_batch_max_items", 1)
+    item = {"letter_ranges": "A-F", "context": "Hi"}
+    response = await client.post("/api/predict/batch", json={"items": [item, item]})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,106 @@
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import pytest
+from httpx import AsyncClient
+from starlette import status
+
+from dyelog.settings import settings
+from dyelog.utils import DictionaryRegistry, get_dictionary_registry
+
+
+@pytest.fixture
+def word_files(tmp_path: Path) -> Dict[str, Path]:
+    """
+    Two small word lists.
+
+    :param tmp_path: pytest temporary directory.
+    :return: word list files by dictionary name.
+    """
+    files = {"es": tmp_path / "es.txt", "medical": tmp_path / "medical.txt"}
+    files["es"].write_text("hola\nagua\ndolor\n")
+    files["medical"].write_text("pain\nnausea\nfever\n")
+    return files
+
+
+@pytest.fixture
+def registry(
+    word_files: Dict[str, Path],
+    monkeypatch: pytest.MonkeyPatch,
+) -> Iterator[DictionaryRegistry]:
+    """
+    Register the small word lists next to the default dictionary.
+
+    :param word_files: word list files by dictionary name.
+    :param monkeypatch: pytest monkeypatch.
+    :yield: dictionary registry.
+    """
+    monkeypatch.setattr(settings, "dictionaries", word_files)
+    get_dictionary_registry.cache_clear()
+    yield get_dictionary_registry()
+    get_dictionary_registry.cache_clear()
+
+
+def test_lazy_loading_and_eviction(word_files: Dict[str, Path]) -> None:
+    """Indexes are built on first use and the least recently used is evicted."""
+    registry = DictionaryRegistry(word_files, memory_budget=1, max_match_words=100)
+    assert registry.loaded() == []
+    assert registry.get_loaded("es") is None
+
+    matcher = registry.get("es")
+    assert matcher.query(["G-M", "N-T", "G-M", "A-F"]).matches == ["HOLA"]
+    assert registry.get("es") is matcher
+    assert registry.get_loaded("es") is matcher
+    assert registry.loaded() == ["es"]
+
+    registry.get("medical")
+    assert registry.loaded() == ["medical"]
+    assert registry.get_loaded("es") is None
+    assert registry.get("es") is not matcher
+
+    with pytest.raises(KeyError):
+        registry.get("fr")
+
+
+@pytest.mark.anyio
+async def test_predict_with_dictionary(
+    client: AsyncClient,
+    registry: DictionaryRegistry,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Requests match against the dictionary they choose."""
+    from dyelog.web.api.chat import views
+
+    async def score_words(words: List[str], context: str, deadline: object) -> list:
+        return [(word, 80.0) for word in words]
+
+    async def generate_sentences(word: str, context: str, deadline: object) -> list:
+        return []
+
+    monkeypatch.setattr(views, "score_words", score_words)
+    monkeypatch.setattr(views, "generate_sentences", generate_sentences)
+    response = await client.post(
+        "/api/predict",
+        json={"letter_ranges": "A-F G-M U-Z A-F", "context": "", "dictionary": "es"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [option["prompt"] for option in response.json()["prompt_options"]] == [
+        "AGUA",
+    ]
+
+    response = await client.get("/api/dictionaries")
+    assert response.json() == {
+        "default": settings.default_dictionary,
+        "dictionaries": sorted([settings.default_dictionary, "es", "medical"]),
+        "loaded": ["es"],
+    }
+
+
+@pytest.mark.anyio
+async def test_predict_unknown_dictionary(client: AsyncClient) -> None:
+    """Unknown dictionaries are rejected before any work is done."""
+    response = await client.post(
+        "/api/predict",
+        json={"letter_ranges": "A-F", "context": "", "dictionary": "klingon"},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
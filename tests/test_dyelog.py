@@ -2,6 +2,7 @@ import pytest
 from fastapi import FastAPI
 from httpx import AsyncClient
 from starlette import status
+from starlette.testclient import TestClient
 
 
 @pytest.mark.anyio
@@ -15,3 +16,27 @@ async def test_health(client: AsyncClient, fastapi_app: FastAPI) -> None:
     url = fastapi_app.url_path_for("health_check")
     response = await client.get(url)
     assert response.status_code == status.HTTP_200_OK
+
+
+def test_health_after_startup(fastapi_app: FastAPI) -> None:
+    """
+    Checks that the health endpoint reports readiness after startup.
+
+    :param fastapi_app: current FastAPI application.
+    """
+    url = fastapi_app.url_path_for("health_check")
+    with TestClient(fastapi_app) as client:
+        response = client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert body["status"] == "ready"
+    assert set(body["phases"]) == {
+        "prometheus",
+        "matcher",
+        "precomputed",
+        "ngram",
+        "ollama",
+        "llm_cache",
+        "prompt_cursors",
+        "speech",
+    }
@@ -0,0 +1,130 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+from dyelog.settings import settings
+from dyelog.utils import (
+    IncrementalMatcher,
+    MatchDelta,
+    PatternMatcher,
+    run_cpu_bound,
+)
+
+WORDS = ["PARIS", "PASTA", "PIZZA", "TRAIN", "HELLO", "PA", "PAD", "PAR", "PARK", "A"]
+
+
+@pytest.fixture
+def matcher(tmp_path: Path) -> PatternMatcher:
+    """
+    Matcher over a small word list.
+
+    :param tmp_path: temporary directory.
+    :return: pattern matcher.
+    """
+    words_file = tmp_path / "words.txt"
+    words_file.write_text("\n".join(WORDS) + "\n")
+    return PatternMatcher(file=words_file)
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    ["N-T", "N-T A-F", "N-T A-F N-T", "N-T A-F N-T G-M N-T", "G-M A-F G-M G-M N-T"],
+)
+def test_query_matches_find_matches(matcher: PatternMatcher, pattern: str) -> None:
+    """Incremental results equal a full rescan."""
+    incremental = IncrementalMatcher(matcher, max_words=1000)
+    assert incremental.query(pattern.split()).matches == matcher.find_matches(pattern)
+
+
+def test_apply_deltas(matcher: PatternMatcher) -> None:
+    """Append, change and remove build on the previous query."""
+    incremental = IncrementalMatcher(matcher, max_words=1000)
+    result = incremental.query(["N-T", "A-F"])
+    assert result.matches == ["PA"]
+
+    result = incremental.apply(result.handle, MatchDelta("append", "N-T"))
+    assert result.matches == ["PAR"]
+
+    result = incremental.apply(result.handle, MatchDelta("change", "A-F"))
+    assert result.handle.groups == ("N-T", "A-F", "A-F")
+    assert result.matches == matcher.find_matches("N-T A-F A-F") == ["PAD"]
+
+    result = incremental.apply(result.handle, MatchDelta("change", "N-T"))
+    assert result.handle.groups == ("N-T", "A-F", "N-T")
+    assert result.matches == matcher.find_matches("N-T A-F N-T") == ["PAR"]
+
+    result = incremental.apply(result.handle, MatchDelta("append", "G-M"))
+    assert result.matches == ["PARK"]
+
+    result = incremental.apply(result.handle, MatchDelta("remove"))
+    assert result.matches == ["PAR"]
+
+
+def test_append_requires_group(matcher: PatternMatcher) -> None:
+    """Append and change deltas need a group."""
+    incremental = IncrementalMatcher(matcher, max_words=1000)
+    handle = incremental.query(["N-T"]).handle
+    with pytest.raises(ValueError):
+        incremental.apply(handle, MatchDelta("append"))
+
+
+def test_cache_is_bounded(matcher: PatternMatcher) -> None:
+    """Old prefix states are evicted once the word budget is exceeded."""
+    incremental = IncrementalMatcher(matcher, max_words=4)
+    incremental.query(["N-T", "A-F", "N-T", "G-M", "N-T"])
+    incremental.query(["G-M", "A-F", "G-M", "G-M", "N-T"])
+    assert incremental._size <= 4 or len(incremental._states) == 1  # noqa: SLF001
+    assert incremental.query(["N-T", "A-F", "N-T"]).matches == ["PAR"]
+
+
+def test_cost(matcher: PatternMatcher) -> None:
+    """Cost is the longest cached prefix, or the matches once cached."""
+    incremental = IncrementalMatcher(matcher, max_words=1000)
+    assert incremental.cost(["N-T", "A-F"]) == len(WORDS)
+    incremental.query(["N-T"])
+    assert incremental.cost(["N-T", "A-F", "N-T"]) == 8
+    incremental.query(["N-T", "A-F"])
+    assert incremental.cost(["N-T", "A-F"]) == 1
+
+
+def test_queries_dont_wait_for_other_prefixes(
+    matcher: PatternMatcher,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A cached lookup doesn't wait for a slow miss; misses are computed once."""
+    incremental = IncrementalMatcher(matcher, max_words=1000)
+    incremental.query(["N-T", "A-F"])
+    release = threading.Event()
+    filtered = []
+    original = incremental._filter  # noqa: SLF001
+
+    def slow_filter(parent: dict, key: tuple) -> dict:
+        filtered.append(key)
+        release.wait(5)
+        return original(parent, key)
+
+    monkeypatch.setattr(incremental, "_filter", slow_filter)
+    threads = [
+        threading.Thread(target=incremental.query, args=(["G-M"],)) for _ in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    while not filtered:
+        release.wait(0.001)
+
+    assert incremental.cost(["N-T", "A-F"]) == 1
+    assert incremental.query(["N-T", "A-F"]).matches == ["PA"]
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert filtered == [("G-M",)]
+
+
+@pytest.mark.anyio
+async def test_run_cpu_bound(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Cheap work runs inline, the rest in the CPU pool."""
+    monkeypatch.setattr(settings, "cpu_offload_min_words", 100)
+    loop_thread = threading.get_ident()
+    assert await run_cpu_bound("test", 99, threading.get_ident) == loop_thread
+    assert await run_cpu_bound("test", 100, threading.get_ident) != loop_thread
@@ -0,0 +1,176 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import pytest
+
+from dyelog.services.llm import (
+    LLMCache,
+    TrafficRecorder,
+    chat,
+    get_circuit_breaker,
+    get_llm_cache,
+    get_traffic_recorder,
+    load_traffic,
+)
+from dyelog.services.llm import client as llm_client
+from dyelog.settings import ModelConfig, settings
+
+
+class RecordingOllama:
+    """Ollama client stand-in remembering the arguments of every call."""
+
+    def __init__(self) -> None:
+        self.calls: List[Dict[str, Any]] = []
+
+    async def chat(self, **kwargs: Any) -> Any:
+        """
+        Answer a chat request.
+
+        :param kwargs: chat arguments.
+        :return: chat response scoring THE.
+        """
+        self.calls.append(kwargs)
+        return {"message": {"content": "THE:90"}}
+
+
+@pytest.fixture
+def ollama(monkeypatch: pytest.MonkeyPatch) -> Iterator[RecordingOllama]:
+    """
+    Replace the Ollama client and reset the circuit breaker.
+
+    :param monkeypatch: pytest monkeypatch.
+    :yield: fake client.
+    """
+    fake = RecordingOllama()
+    monkeypatch.setattr(llm_client, "get_ollama_client", lambda: fake)
+    get_circuit_breaker.cache_clear()
+    get_traffic_recorder.cache_clear()
+    get_llm_cache.cache_clear()
+    yield fake
+    get_circuit_breaker.cache_clear()
+    get_traffic_recorder.cache_clear()
+    get_llm_cache.cache_clear()
+
+
+@pytest.mark.anyio
+async def test_task_models(
+    ollama: RecordingOllama,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Tasks with a configured model use it and its options."""
+    monkeypatch.setattr(
+        settings,
+        "ollama_task_models",
+        {"score_words": ModelConfig(model="small:q4_K_M", temperature=0.0)},
+    )
+    await chat("Score", task="score_words")
+    await chat("Write", task="generate_sentences")
+
+    assert ollama.calls[0]["model"] == "small:q4_K_M"
+    assert ollama.calls[0]["options"] == {"temperature": 0.0}
+    assert ollama.calls[1]["model"] == settings.ollama_model
+    assert ollama.calls[1]["options"] is None
+
+
+@pytest.mark.anyio
+async def test_traffic_recording(
+    ollama: RecordingOllama,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Successful calls are appended to the traffic file."""
+    path = tmp_path / "traffic.jsonl"
+    monkeypatch.setattr(settings, "llm_traffic_file", path)
+    await chat("Score", task="score_words")
+    recorder = get_traffic_recorder()
+    assert recorder is not None
+    recorder.close()
+
+    (entry,) = load_traffic(path)
+    assert entry["task"] == "score_words"
+    assert entry["model"] == {"model": settings.ollama_model}
+    assert entry["prompt"] == "Score"
+    assert entry["content"] == "THE:90"
+    assert entry["latency_ms"] >= 0
+
+
+def test_traffic_sampling(tmp_path: Path) -> None:
+    """Calls sampled out aren't written."""
+    path = tmp_path / "traffic.jsonl"
+    recorder = TrafficRecorder(path, sample_rate=0.0)
+    recorder.record({"task": "score_words"})
+    recorder.close()
+    assert list(load_traffic(path)) == []
+
+
+def test_cache_shared_and_persistent(tmp_path: Path) -> None:
+    """Entries written by one connection are read by another one."""
+    path = tmp_path / "cache.sqlite3"
+    LLMCache(path, ttl=60, max_entries=10).set("key", "THE:90")
+    assert LLMCache(path, ttl=60, max_entries=10).get("key") == "THE:90"
+
+
+def test_cache_eviction(tmp_path: Path) -> None:
+    """Expired entries aren't returned and the oldest are evicted."""
+    cache = LLMCache(tmp_path / "cache.sqlite3", ttl=60, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    cache.evict()
+    assert len(cache) == 2
+    assert cache.get("a") is None
+    assert cache.get("c") == "c"
+
+    cache.ttl = -1
+    cache.set("d", "d")
+    assert cache.get("d") is None
+
+
+def test_cache_reads_dont_wait_for_writers(tmp_path: Path) -> None:
+    """Lookups return while a write waits for another worker's write lock."""
+    path = tmp_path / "cache.sqlite3"
+    cache = LLMCache(path, ttl=60, max_entries=10)
+    cache.set("key", "THE:90")
+    other_worker = sqlite3.connect(path, isolation_level=None)
+    other_worker.execute("BEGIN IMMEDIATE")
+    writer = threading.Thread(target=cache.set, args=("other", "AND:80"))
+    writer.start()
+    time.sleep(0.1)
+
+    start = time.perf_counter()
+    assert cache.get("key") == "THE:90"
+    assert time.perf_counter() - start < 0.5
+
+    other_worker.rollback()
+    writer.join()
+    other_worker.close()
+    assert cache.get("other") == "AND:80"
+
+
+@pytest.mark.anyio
+async def test_chat_cache(
+    ollama: RecordingOllama,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Cached replies skip Ollama unless the cache is bypassed."""
+    monkeypatch.setattr(settings, "llm_cache_file", tmp_path / "cache.sqlite3")
+    await chat("Score", task="score_words")
+    cache = get_llm_cache()
+    assert cache is not None
+    while not len(cache):
+        await asyncio.sleep(0.01)
+
+    response = await chat("Score", task="score_words")
+    assert response == {
+        "message": {"role": "assistant", "content": "THE:90"},
+        "cached": True,
+    }
+    assert len(ollama.calls) == 1
+
+    await chat("Score", task="generate_sentences")
+    await chat("Score", task="score_words", cache=False)
+    assert len(ollama.calls) == 3
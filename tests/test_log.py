@@ -0,0 +1,59 @@
+import logging
+import queue
+
+from dyelog.log import BackgroundQueueHandler, truncate
+
+
+def _handler(
+    log_queue: "queue.Queue[logging.LogRecord]",
+    debug_sample_rate: float = 1.0,
+) -> BackgroundQueueHandler:
+    return BackgroundQueueHandler(
+        log_queue,
+        max_items=3,
+        max_chars=5,
+        debug_sample_rate=debug_sample_rate,
+    )
+
+
+def _record(level: int = logging.DEBUG, **fields: object) -> logging.LogRecord:
+    record = logging.LogRecord("test", level, __file__, 1, "found %d", (3,), None)
+    record.fields = fields
+    return record
+
+
+def test_truncate() -> None:
+    """Large sequences and long strings are cut down."""
+    assert truncate(["A", "B"], 3, 5) == ["A", "B"]
+    assert truncate(["A"] * 10, 3, 5) == {"items": ["A", "A", "A"], "total": 10}
+    assert truncate("abcdefgh", 3, 5) == "abcde... (8 chars)"
+    assert truncate(42, 3, 5) == 42
+
+
+def test_handler_truncates_fields() -> None:
+    """Queued records carry the rendered message and truncated fields."""
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue()
+    _handler(log_queue).handle(_record(words=list(range(100))))
+    record = log_queue.get_nowait()
+    assert record.getMessage() == "found 3"
+    assert record.fields == {"words": {"items": [0, 1, 2], "total": 100}}
+
+
+def test_handler_drops_when_full() -> None:
+    """The caller is never blocked by a full queue."""
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=1)
+    handler = _handler(log_queue)
+    handler.handle(_record())
+    handler.handle(_record())
+    assert log_queue.qsize() == 1
+    assert handler.dropped == 1
+
+
+def test_handler_samples_debug_records() -> None:
+    """DEBUG records are sampled, INFO and above are always kept."""
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue()
+    handler = _handler(log_queue, debug_sample_rate=0.0)
+    handler.handle(_record(logging.DEBUG))
+    handler.handle(_record(logging.INFO))
+    assert log_queue.qsize() == 1
+    assert log_queue.get_nowait().levelno == logging.INFO
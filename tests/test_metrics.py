@@ -0,0 +1,30 @@
+from prometheus_client import REGISTRY
+
+from dyelog.metrics import observe_llm_response, observe_stage
+
+
+def _sample(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_observe_stage() -> None:
+    """Every wrapped block is recorded in the stage histogram."""
+    before = _sample("dyelog_stage_duration_seconds_count", stage="test_stage")
+    with observe_stage("test_stage"):
+        pass
+    after = _sample("dyelog_stage_duration_seconds_count", stage="test_stage")
+    assert after == before + 1
+
+
+def test_observe_llm_response() -> None:
+    """Token counts are taken from the ollama response."""
+    before = _sample("dyelog_llm_tokens_sum", task="test_task", kind="prompt")
+    observe_llm_response("test_task", {"prompt_eval_count": 120, "eval_count": None})
+    assert (
+        _sample("dyelog_llm_tokens_sum", task="test_task", kind="prompt")
+        == before + 120
+    )
+    assert _sample("dyelog_llm_tokens_count", task="test_task", kind="response") == 0
+    assert (
+        _sample("dyelog_llm_requests_total", task="test_task", outcome="success") >= 1
+    )
@@ -0,0 +1,94 @@
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+from httpx import AsyncClient
+from starlette import status
+
+from dyelog.settings import settings
+from dyelog.utils import NgramModel, get_ngram_model
+from dyelog.utils.ngram import compile_model, tokenize
+
+CORPUS = """\
+I would like some water. I would like some tea.
+I would like to sleep! I want to sleep.
+Can I have some water? I want some soup.
+"""
+
+
+@pytest.fixture
+def model() -> NgramModel:
+    """
+    Trigram model of a tiny corpus.
+
+    :return: n-gram model.
+    """
+    return compile_model(tokenize(CORPUS.splitlines()), order=3, min_count=1)
+
+
+@pytest.fixture
+def model_file(model: NgramModel, tmp_path: Path) -> Iterator[Path]:
+    """
+    Save the model and configure the app to use it.
+
+    :param model: n-gram model.
+    :param tmp_path: pytest temporary directory.
+    :yield: model file.
+    """
+    path = tmp_path / "ngram.bin"
+    model.save(path)
+    original = settings.ngram_file
+    settings.ngram_file = path
+    get_ngram_model.cache_clear()
+    yield path
+    settings.ngram_file = original
+    get_ngram_model.cache_clear()
+
+
+def test_tokenize() -> None:
+    """Sentences end at punctuation and line breaks."""
+    assert list(tokenize(["Hi there. How are you?", "fine"])) == [
+        ["HI", "THERE"],
+        ["HOW", "ARE", "YOU"],
+        ["FINE"],
+    ]
+
+
+def test_predict_uses_longest_context(model: NgramModel) -> None:
+    """Trigram continuations come first, shorter contexts fill up the rest."""
+    predicted = model.predict(["I", "would"], limit=3)
+    assert [word for word, _ in predicted] == ["LIKE", "I", "SOME"]
+    assert predicted[0][1] == 1.0
+    assert model.predict(["like", "some"], limit=1)[0][0] in {"WATER", "TEA"}
+
+
+def test_predict_unknown_words_back_off(model: NgramModel) -> None:
+    """Unknown words fall back to the word frequencies."""
+    predicted = model.predict(["zebra"], limit=2)
+    assert [word for word, _ in predicted] == ["I", "SOME"]
+
+
+def test_predict_allowed(model: NgramModel) -> None:
+    """The filter is applied before the limit."""
+    predicted = model.predict(["I", "want"], limit=2, allowed=lambda w: w[0] == "S")
+    assert [word for word, _ in predicted] == ["SOME", "SLEEP"]
+
+
+def test_save_and_load(model: NgramModel, model_file: Path) -> None:
+    """A saved model predicts the same as the original."""
+    loaded = NgramModel.load(model_file)
+    assert loaded.predict(["I"], limit=5) == model.predict(["I"], limit=5)
+
+
+@pytest.mark.anyio
+async def test_predict_next_words(client: AsyncClient, model_file: Path) -> None:
+    """Next words are filtered by the letter ranges typed so far."""
+    response = await client.post(
+        "/api/predict/next",
+        json={"words": ["I", "want"], "letter_ranges": "N-T N-T", "limit": 2},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [option["prompt"] for option in response.json()["prompt_options"]] == [
+        "SOME",
+        "TO",
+    ]
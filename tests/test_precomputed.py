@@ -0,0 +1,183 @@
+from pathlib import Path
+from typing import Iterator, List
+
+import pytest
+from httpx import AsyncClient
+from starlette import status
+
+from dyelog import precompute
+from dyelog.services.llm import LLMUnavailableError
+from dyelog.settings import ModelConfig, settings
+from dyelog.web.api.chat import precomputed, views
+from dyelog.web.api.chat.precomputed import (
+    PrecomputedTable,
+    StalePrecomputedTableError,
+    current_table_version,
+    table_version,
+)
+
+
+@pytest.fixture
+def table_file(tmp_path: Path) -> Path:
+    """
+    A table with a single entry, versioned for the current settings.
+
+    :param tmp_path: pytest temporary directory.
+    :return: path of the table.
+    """
+    table = PrecomputedTable(current_table_version())
+    table.add(
+        "What would you like to eat?",
+        "N-T G-M U-Z U-Z A-F",
+        [("PIZZA", 95.0), ("PHYLA", 31.0)],
+        ["I would like pizza."],
+    )
+    path = tmp_path / "precomputed.json.gz"
+    table.save(path)
+    return path
+
+
+@pytest.fixture
+def use_table(
+    table_file: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> Iterator[None]:
+    """
+    Serve predictions from ``table_file``.
+
+    :param table_file: precomputed table.
+    :param monkeypatch: pytest monkeypatch.
+    :yield: nothing.
+    """
+    monkeypatch.setattr(settings, "precomputed_file", table_file)
+    precomputed.get_precomputed_table.cache_clear()
+    yield
+    precomputed.get_precomputed_table.cache_clear()
+
+
+def test_stale_table(table_file: Path) -> None:
+    """Tables built for another model are rejected."""
+    version = table_version(
+        settings.words_file,
+        {"score_words": ModelConfig(model="another-model")},
+    )
+    with pytest.raises(StalePrecomputedTableError):
+        PrecomputedTable.load(table_file, version)
+
+
+def test_stale_table_is_not_served(
+    table_file: Path,
+    use_table: None,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """A stale configured table is replaced by an empty one with an error."""
+    monkeypatch.setattr(settings, "ollama_model", "another-model")
+    table = precomputed.get_precomputed_table()
+    assert len(table) == 0
+    assert table.error is not None
+
+
+def test_task_model_change_makes_table_stale(
+    table_file: Path,
+    use_table: None,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Tables are stale once the model or options of a task change."""
+    for model in (
+        ModelConfig(model="small:q4_K_M"),
+        ModelConfig(model=settings.ollama_model, temperature=0.0),
+    ):
+        monkeypatch.setattr(settings, "ollama_task_models", {"score_words": model})
+        precomputed.get_precomputed_table.cache_clear()
+        table = precomputed.get_precomputed_table()
+        assert len(table) == 0
+        assert table.error is not None
+
+
+@pytest.mark.anyio
+async def test_predict_from_table(
+    client: AsyncClient,
+    use_table: None,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Precomputed contexts are answered without calling the LLM."""
+
+    async def fail(*args: object, **kwargs: object) -> None:
+        raise AssertionError("LLM called")
+
+    monkeypatch.setattr(views, "score_words", fail)
+    monkeypatch.setattr(views, "generate_sentences", fail)
+    response = await client.post(
+        "/api/predict",
+        json={
+            "letter_ranges": "n-t g-m u-z u-z a-f",
+            "context": "  what would you like to EAT? ",
+            "top_k": 1,
+        },
+    )
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert body["prompt_options"] == [{"id": 0, "prompt": "PIZZA", "confidence": 95.0}]
+    assert body["sentences"] == ["I would like pizza."]
+    assert body["next_cursor"] is not None
+    assert body["degraded"] is False
+
+
+def test_precompute_cli(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """The CLI writes a loadable table covering every matching pattern."""
+
+    async def score_words(words: List[str], context: str) -> List[tuple]:
+        return [(word, 50.0) for word in sorted(words)]
+
+    async def generate_sentences(word: str, context: str) -> List[str]:
+        return [f"{word.lower()}."]
+
+    monkeypatch.setattr(views, "score_words", score_words)
+    monkeypatch.setattr(views, "generate_sentences", generate_sentences)
+    contexts = tmp_path / "contexts.txt"
+    contexts.write_text("Are you in pain?\n\n")
+    output = tmp_path / "table.json.gz"
+
+    status_code = precompute.main(
+        ["--contexts", str(contexts), "--output", str(output), "--max-length", "2"],
+    )
+
+    assert status_code == 0
+    table = PrecomputedTable.load(
+        output,
+        current_table_version(),
+    )
+    found = table.lookup("Are you in pain?", "U-Z A-F")
+    assert found is not None
+    assert ("YE", 50.0) in found[0]
+    assert len(table) <= 4 + 16
+
+
+def test_precompute_keeps_entries_when_llm_fails(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Entries the LLM fails for are skipped and the rest is still written."""
+
+    async def score_words(words: List[str], context: str) -> List[tuple]:
+        if "YE" in words:
+            raise LLMUnavailableError("circuit_open")
+        return [(word, 50.0) for word in sorted(words)]
+
+    async def generate_sentences(word: str, context: str) -> List[str]:
+        return [f"{word.lower()}."]
+
+    monkeypatch.setattr(views, "score_words", score_words)
+    monkeypatch.setattr(views, "generate_sentences", generate_sentences)
+    contexts = tmp_path / "contexts.txt"
+    contexts.write_text("Are you in pain?\n")
+    output = tmp_path / "table.json.gz"
+
+    status_code = precompute.main(
+        ["--contexts", str(contexts), "--output", str(output), "--max-length", "2"],
+    )
+
+    assert status_code == 1
+    table = PrecomputedTable.load(output, current_table_version())
+    assert table.lookup("Are you in pain?", "U-Z A-F") is None
+    assert table.lookup("Are you in pain?", "N-T A-F") is not None
@@ -0,0 +1,219 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, Iterator
+
+import pytest
+from fastapi import FastAPI
+from starlette import status
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from dyelog.services.speech import (
+    RecognitionConfig,
+    SynthesisConfig,
+    get_speech_backend,
+)
+from dyelog.services.speech.google_cloud import GoogleSpeechBackend
+from dyelog.services.speech.local import LocalSpeechBackend
+from dyelog.settings import settings
+
+
+@pytest.fixture
+def speech_client(fastapi_app: FastAPI) -> TestClient:
+    """
+    Client for the app with the local speech backend.
+
+    :param fastapi_app: current FastAPI application.
+    :return: test client.
+    """
+    fastapi_app.dependency_overrides[get_speech_backend] = LocalSpeechBackend
+    return TestClient(fastapi_app)
+
+
+def test_transcribe_stream(speech_client: TestClient) -> None:
+    """Interim transcripts are pushed per chunk, followed by a final one."""
+    with speech_client.websocket_connect("/api/transcribe-stream") as websocket:
+        websocket.send_bytes(b"I would")
+        assert websocket.receive_json() == {
+            "text": "I would",
+            "confidence": 0.0,
+            "is_final": False,
+        }
+        websocket.send_bytes(b"like pizza")
+        assert websocket.receive_json()["text"] == "I would like pizza"
+        websocket.send_text("end")
+        final = websocket.receive_json()
+        assert final["is_final"]
+        assert final["text"] == "I would like pizza"
+        with pytest.raises(WebSocketDisconnect):
+            websocket.receive_json()
+
+
+def test_transcribe_stream_chunk_too_large(speech_client: TestClient) -> None:
+    """Oversized audio chunks close the connection."""
+    with speech_client.websocket_connect("/api/transcribe-stream") as websocket:
+        websocket.send_bytes(b"a" * (settings.speech_stream_max_chunk_bytes + 1))
+        with pytest.raises(WebSocketDisconnect) as exc_info:
+            websocket.receive_json()
+        assert exc_info.value.code == status.WS_1009_MESSAGE_TOO_BIG
+
+
+def test_synthesize_speech(speech_client: TestClient) -> None:
+    """A single text is synthesized into one audio file."""
+    response = speech_client.post(
+        "/api/synthesize-speech",
+        json={"text": "I would like pizza"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == b"I would like pizza"
+
+
+@pytest.mark.anyio
+async def test_synthesize_stream_chunks() -> None:
+    """Synthesized audio is split into chunks of the requested size."""
+    backend = LocalSpeechBackend()
+    chunks = [
+        chunk
+        async for chunk in backend.synthesize_stream(
+            "I would like pizza",
+            SynthesisConfig(),
+            chunk_size=4,
+        )
+    ]
+    assert b"".join(chunks) == b"I would like pizza"
+    assert all(len(chunk) <= 4 for chunk in chunks)
+    assert len(chunks) == 5
+
+
+class SlowSpeechClient:
+    """Speech-to-Text client stand-in echoing every chunk after a delay."""
+
+    def streaming_recognize(self, config: Any, requests: Iterator[Any]) -> Any:
+        """
+        Answer a stream of audio requests.
+
+        :param config: streaming configuration.
+        :param requests: audio requests.
+        :yield: one response per request.
+        """
+        for request in requests:
+            time.sleep(0.01)
+            alternative = SimpleNamespace(
+                transcript=request.audio_content.decode(),
+                confidence=1.0,
+            )
+            yield SimpleNamespace(
+                results=[SimpleNamespace(alternatives=[alternative], is_final=False)],
+            )
+
+
+@pytest.mark.anyio
+async def test_google_streams_dont_use_default_executor() -> None:
+    """Concurrent streams run without threads of the default executor."""
+    backend = object.__new__(GoogleSpeechBackend)
+    backend.max_buffered_chunks = 1
+    backend.stt_client = SlowSpeechClient()
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1)
+    loop.set_default_executor(executor)
+
+    async def audio() -> AsyncIterator[bytes]:
+        for chunk in (b"I", b"would", b"like", b"pizza"):
+            yield chunk
+
+    async def transcribe() -> str:
+        transcripts = backend.streaming_recognize(audio(), RecognitionConfig())
+        return " ".join([transcript.text async for transcript in transcripts])
+
+    try:
+        texts = await asyncio.wait_for(
+            asyncio.gather(*(transcribe() for _ in range(4))),
+            timeout=5,
+        )
+    finally:
+        executor.shutdown()
+    assert texts == ["I would like pizza"] * 4
+
+
+@pytest.mark.parametrize(
+    "params,headers,media_type",
+    [
+        ({}, {}, "audio/mp3"),
+        ({"encoding": "ogg_opus"}, {}, "audio/ogg"),
+        ({}, {"Accept": "audio/wav;q=0.9, audio/ogg"}, "audio/ogg"),
+        ({}, {"Accept": "audio/ogg;q=0, audio/wav;q=0.5"}, "audio/wav"),
+        ({}, {"Accept": "audio/wav, audio/ogg"}, "audio/wav"),
+        ({}, {"Accept": "audio/*, audio/ogg;q=0.5"}, "audio/mp3"),
+        ({"encoding": "MP3"}, {"Accept": "audio/ogg"}, "audio/mp3"),
+    ],
+)
+def test_synthesize_speech_encoding(
+    speech_client: TestClient,
+    params: Dict[str, str],
+    headers: Dict[str, str],
+    media_type: str,
+) -> None:
+    """The audio encoding is taken from the query or the Accept header."""
+    response = speech_client.post(
+        "/api/synthesize-speech",
+        params=params,
+        headers=headers,
+        json={"text": "hi"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == media_type
+
+
+def test_synthesize_speech_invalid_encoding(speech_client: TestClient) -> None:
+    """Unknown encodings are rejected."""
+    response = speech_client.post(
+        "/api/synthesize-speech",
+        params={"encoding": "WMA"},
+        json={"text": "hi"},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_transcribe_speech(speech_client: TestClient) -> None:
+    """Uploaded audio is transcribed with the requested encoding."""
+    response = speech_client.post(
+        "/api/transcribe-speech",
+        params={"encoding": "LINEAR16", "sample_rate_hertz": 8000},
+        files={"audio_file": ("speech.wav", b"hello there")},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"text": "hello there", "confidence": 1.0}
+
+
+def test_synthesize_speech_batch(speech_client: TestClient) -> None:
+    """Every text comes back as a separate multipart part."""
+    texts = ["I would like pizza.", "Pizza sounds great.", "Can we order pizza?"]
+    response = speech_client.post(
+        "/api/synthesize-speech/batch",
+        json={"texts": texts},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    boundary = response.headers["content-type"].split("boundary=")[1]
+    parts = response.content.split(f"--{boundary}".encode())[1:-1]
+    clips = {}
+    for part in parts:
+        headers, body = part.split(b"\r\n\r\n", 1)
+        content_id = next(
+            line
+            for line in headers.decode().splitlines()
+            if line.startswith("Content-ID")
+        )
+        assert content_id.startswith("Content-ID: <")
+        clips[int(content_id.split(":")[1].strip(" <>"))] = body[: -len(b"\r\n")]
+    assert clips == {index: text.encode() for index, text in enumerate(texts)}
+
+
+def test_synthesize_speech_batch_too_many(speech_client: TestClient) -> None:
+    """Batches above the configured size are rejected."""
+    response = speech_client.post(
+        "/api/synthesize-speech/batch",
+        json={"texts": ["hi"] * (settings.tts_batch_max_items + 1)},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
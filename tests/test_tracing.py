@@ -0,0 +1,125 @@
+import asyncio
+from typing import Any, Iterator
+
+import pytest
+from httpx import AsyncClient
+from starlette import status
+
+from dyelog.services.llm import client as llm_client
+from dyelog.services.llm import get_circuit_breaker
+from dyelog.settings import settings
+from dyelog.tracing import get_trace_store
+
+ADMIN = {"Authorization": "Bearer secret"}
+
+
+class FakeOllama:
+    """Ollama client stand-in reporting its own timings."""
+
+    async def chat(self, **kwargs: Any) -> Any:
+        """
+        Answer a chat request.
+
+        :param kwargs: ignored.
+        :return: chat response scoring THE.
+        """
+        await asyncio.sleep(0.01)
+        return {
+            "message": {"content": "THE:90"},
+            "total_duration": 8_000_000,
+            "eval_count": 3,
+        }
+
+
+@pytest.fixture(autouse=True)
+def tracing(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    """
+    Fake Ollama, an admin token and an empty trace store.
+
+    :param monkeypatch: pytest monkeypatch.
+    :yield: nothing.
+    """
+    monkeypatch.setattr(llm_client, "get_ollama_client", FakeOllama)
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    get_circuit_breaker.cache_clear()
+    get_trace_store.cache_clear()
+    yield
+    get_circuit_breaker.cache_clear()
+    get_trace_store.cache_clear()
+
+
+@pytest.mark.anyio
+async def test_traced_predict(client: AsyncClient) -> None:
+    """A request with the trace header records spans for every stage."""
+    response = await client.post(
+        "/api/predict",
+        json={"letter_ranges": "N-T G-M A-F", "context": "Hi"},
+        headers={settings.trace_header: "1", **ADMIN},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    trace_id = response.headers[settings.trace_header]
+
+    response = await client.get(f"/api/admin/traces/{trace_id}", headers=ADMIN)
+    assert response.status_code == status.HTTP_200_OK
+    trace = response.json()
+    assert trace["path"] == "/api/predict"
+    assert trace["profile"] is None
+    spans = {span["name"]: span for span in trace["spans"]}
+    assert spans["predict"]["depth"] == 0
+    assert spans["generate_words"]["depth"] == 1
+    assert spans["find_matches"]["depth"] == 2
+    assert spans["score_words"]["depth"] == 2
+    assert spans["generate_sentences"]["depth"] == 1
+    assert "serialize" in spans
+    chats = [span for span in trace["spans"] if span["name"] == "ollama_chat"]
+    assert [span["depth"] for span in chats] == [3, 2]
+    assert chats[0]["attrs"]["ollama_total_ms"] == 8.0
+
+
+@pytest.mark.anyio
+async def test_untraced_and_profiled_requests(client: AsyncClient) -> None:
+    """Only requests asking for it are traced; "profile" adds a CPU profile."""
+    await client.get("/api/health")
+    await client.get(
+        "/api/health",
+        headers={settings.trace_header: "profile", **ADMIN},
+    )
+
+    response = await client.get("/api/admin/traces", headers=ADMIN)
+    traces = response.json()
+    assert len(traces) == 1
+    assert traces[0]["profile"]["samples"] >= 0
+
+
+@pytest.mark.anyio
+async def test_trace_header_requires_token(
+    client: AsyncClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Without the admin token the trace header is ignored."""
+    for headers in (
+        {settings.trace_header: "profile"},
+        {settings.trace_header: "profile", "Authorization": "Bearer wrong"},
+    ):
+        response = await client.get("/api/health", headers=headers)
+        assert settings.trace_header not in response.headers
+    monkeypatch.setattr(settings, "admin_token", None)
+    response = await client.get(
+        "/api/health",
+        headers={settings.trace_header: "profile", **ADMIN},
+    )
+    assert settings.trace_header not in response.headers
+    assert get_trace_store().slowest(10) == []
+
+
+@pytest.mark.anyio
+async def test_admin_requires_token(
+    client: AsyncClient,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Admin endpoints need the token and are hidden without one."""
+    response = await client.get("/api/admin/traces")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    monkeypatch.setattr(settings, "admin_token", None)
+    response = await client.get("/api/admin/traces", headers=ADMIN)
+    assert response.status_code == status.HTTP_404_NOT_FOUND